@@ -1,6 +1,8 @@
 import os
 from functools import wraps
+import orjson
 from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_socketio import SocketIO
 from dotenv import load_dotenv
 from database import (
@@ -32,6 +34,19 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "shipping-secret-key-change-in-production")
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16 MB max upload
 
+
+# Serialize jsonify responses with orjson — the big conversation/message
+# payloads encode several times faster than with stdlib json
+class OrjsonProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+app.json = OrjsonProvider(app)
+
 # Enable gzip compression — reduces response size ~70%
 from flask_compress import Compress
 app.config["COMPRESS_MIN_SIZE"] = 500  # Compress responses > 500 bytes
@@ -588,7 +603,8 @@ def admin_dashboard():
     search = request.args.get("search", "").strip() or None
     show_inactive = request.args.get("show_inactive") == "1"
     stats = get_stats()
-    customers = get_all_customers(search=search, show_inactive=show_inactive)
+    # Template iterates more than once — materialize the streamed rows
+    customers = list(get_all_customers(search=search, show_inactive=show_inactive))
     return render_template("admin_dashboard.html", stats=stats, customers=customers,
                            search=search, show_inactive=show_inactive,
                            STATUS_MAP=STATUS_MAP, active_tab="customers",
@@ -746,7 +762,7 @@ def admin_shipment_create():
         tracking = add_shipment(customer_code, description, weight, port, dest_id)
         flash(f"สร้าง Shipment สำเร็จ — Tracking: {tracking}", "success")
         return redirect(url_for("admin_shipments"))
-    customers = get_all_customers()
+    customers = list(get_all_customers())
     return render_template("admin_shipment_create.html", customers=customers,
                            PORTS=PORTS, active_tab="shipments")
 
@@ -761,7 +777,7 @@ def admin_shipment_create():
 def admin_shipments():
     search = request.args.get("search", "").strip() or None
     status_filter = request.args.get("status", "all")
-    shipments = get_all_shipments(search=search, status_filter=status_filter)
+    shipments = list(get_all_shipments(search=search, status_filter=status_filter))
     address_map = {}
     for s in shipments:
         cc = s["customer_code"]
@@ -820,7 +836,7 @@ def admin_bulk_update():
 def admin_inbound():
     search = request.args.get("search", "").strip() or None
     status_filter = request.args.get("status", "all")
-    packages = get_all_inbound_packages(search=search, status_filter=status_filter)
+    packages = list(get_all_inbound_packages(search=search, status_filter=status_filter))
     return render_template("admin_inbound.html", packages=packages,
                            status_filter=status_filter, search=search,
                            INBOUND_STATUS_MAP=INBOUND_STATUS_MAP,
@@ -848,7 +864,7 @@ def admin_update_inbound(inbound_id):
 @admin_required
 def admin_rates():
     rates = load_rates()
-    customers = get_all_customers()
+    customers = list(get_all_customers())
     is_super = session.get("admin_role") == "super_admin"
     return render_template("admin_rates.html", rates=rates, customers=customers,
                            is_super=is_super, active_tab="rates", TIERS=TIERS)
@@ -892,7 +908,7 @@ def admin_requests():
     requests_list = get_all_rate_requests()
     return render_template("admin_requests.html", requests=requests_list,
                            is_super=is_super, active_tab="requests",
-                           customers=get_all_customers())
+                           customers=list(get_all_customers()))
 
 
 @app.route("/admin/requests/add", methods=["POST"])
@@ -1042,6 +1058,11 @@ except Exception as e:
 # Start periodic backup every 6 hours
 start_auto_backup(interval_hours=6)
 
+# Pre-open TLS connections to the AI and platform APIs so the first real
+# call doesn't pay the handshake
+from messaging.utils.http import warmup
+warmup()
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
     debug = os.environ.get("FLASK_DEBUG", "1") == "1"
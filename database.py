@@ -1,9 +1,15 @@
+import atexit
 import sqlite3
 import os
+import sys
 import json
+import queue
 import random
 import string
 import secrets
+import hashlib
+import time
+import threading
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -55,10 +61,140 @@ INBOUND_STATUS_MAP = {
 }
 
 
+# Idle connections parked for reuse. Opening a SQLite connection costs a
+# file open plus the per-connection PRAGMAs; pooling pays that once per
+# worker instead of once per query.
+_POOL_MAX = 8
+_conn_pool = queue.Queue(maxsize=_POOL_MAX)
+
+
+class _PooledConnection:
+    """Proxy that returns its connection to the pool on close().
+
+    Call sites keep the open/close discipline they've always had: close()
+    rolls back any uncommitted work (exactly what a real close would
+    discard) and parks the raw connection for the next get_db() instead
+    of tearing down the handle.
+    """
+
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        self._conn = None
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        try:
+            _conn_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    try:
+        conn = _conn_pool.get_nowait()
+    except queue.Empty:
+        # check_same_thread off: the pool hands a connection to one
+        # caller at a time, so it never sees concurrent use even though
+        # it may be reused from a different thread than created it
+        # cached_statements raises sqlite3's per-connection prepared-
+        # statement cache from the default 128 so the app's full working
+        # set of query shapes stays compiled across pool reuse
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=512)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers proceed while a writer commits (journal_mode
+        # is persistent but cheap to re-assert); the rest are
+        # per-connection: NORMAL sync skips the per-commit fsync that WAL
+        # makes safe to drop, mmap serves pages without buffer copies,
+        # the negative cache_size is KB — a 64MB page cache for the hot
+        # B-trees — temp_store keeps sort/temp B-trees off disk, and the
+        # autocheckpoint cap bounds WAL growth under sustained writes.
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA mmap_size=268435456;
+            PRAGMA cache_size=-65536;
+            PRAGMA wal_autocheckpoint=1000;
+        """)
+    return _PooledConnection(conn)
+
+
+def _close_pool():
+    """Close parked connections at interpreter exit.
+
+    WAL checkpoints on the last close, so this keeps the -wal file from
+    being left behind after a clean shutdown. Connections checked out at
+    exit time are abandoned — their work is either committed already or
+    correctly lost.
+    """
+    first = True
+    while True:
+        try:
+            conn = _conn_pool.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            if first:
+                # Fold the session's query history into planner stats;
+                # once per database, not per connection
+                conn.execute("PRAGMA optimize")
+                first = False
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+atexit.register(_close_pool)
+
+
+def _hash_password(password):
+    # Password hashing is CPU-bound (scrypt/pbkdf2, ~100-300ms) and
+    # dominates the requests that call it. Under the eventlet worker,
+    # hand it to a real OS thread via tpool: werkzeug's hashers release
+    # the GIL, so the hub keeps serving other greenlets while the thread
+    # burns CPU. A process pool is not safe on this stack — monkey-
+    # patching turns the executor's management thread into a greenlet
+    # and forking a live hub hangs rather than raises. Checked through
+    # sys.modules so plain scripts never import eventlet just for this.
+    eventlet = sys.modules.get("eventlet")
+    if eventlet is not None and eventlet.patcher.is_monkey_patched("thread"):
+        from eventlet import tpool
+        return tpool.execute(generate_password_hash, password)
+    return generate_password_hash(password)
+
+
+# check_password_hash re-derives the full scrypt/pbkdf2 key on every call,
+# so repeated identical guesses (bot/credential-stuffing traffic) burn the
+# same CPU each time. Cache recent results keyed by (stored_hash, digest of
+# the submitted password) with a short TTL; first attempt pays full cost.
+_PW_CHECK_TTL = 60
+_PW_CHECK_MAX = 1024
+_pw_check_cache = {}
+
+
+def _check_password_cached(stored_hash, password):
+    key = (stored_hash, hashlib.sha256(password.encode("utf-8")).hexdigest())
+    now = time.monotonic()
+    hit = _pw_check_cache.get(key)
+    if hit is not None and now - hit[1] < _PW_CHECK_TTL:
+        return hit[0]
+    result = check_password_hash(stored_hash, password)
+    if len(_pw_check_cache) >= _PW_CHECK_MAX:
+        _pw_check_cache.clear()
+    _pw_check_cache[key] = (result, now)
+    return result
 
 
 def init_db():
@@ -81,7 +217,9 @@ def init_db():
 
     conn = get_db()
 
-    conn.execute("""
+    # One executescript call parses and runs the whole schema batch in C
+    # instead of six separate execute round-trips.
+    conn.executescript("""
         CREATE TABLE IF NOT EXISTS customers (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             customer_code TEXT UNIQUE NOT NULL,
@@ -101,10 +239,8 @@ def init_db():
             reset_token TEXT DEFAULT NULL,
             reset_token_expiry TIMESTAMP DEFAULT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+        );
 
-    conn.execute("""
         CREATE TABLE IF NOT EXISTS shipments (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             tracking_number TEXT UNIQUE NOT NULL,
@@ -116,20 +252,16 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (customer_code) REFERENCES customers(customer_code)
-        )
-    """)
+        );
 
-    conn.execute("""
         CREATE TABLE IF NOT EXISTS admins (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
             password_hash TEXT NOT NULL,
             role TEXT NOT NULL DEFAULT 'admin',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+        );
 
-    conn.execute("""
         CREATE TABLE IF NOT EXISTS customer_addresses (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             customer_id INTEGER NOT NULL,
@@ -141,10 +273,8 @@ def init_db():
             is_default INTEGER DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (customer_id) REFERENCES customers(id)
-        )
-    """)
+        );
 
-    conn.execute("""
         CREATE TABLE IF NOT EXISTS rate_requests (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             admin_id INTEGER NOT NULL,
@@ -157,10 +287,8 @@ def init_db():
             reviewed_at TIMESTAMP,
             FOREIGN KEY (admin_id) REFERENCES admins(id),
             FOREIGN KEY (reviewed_by) REFERENCES admins(id)
-        )
-    """)
+        );
 
-    conn.execute("""
         CREATE TABLE IF NOT EXISTS inbound_packages (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             customer_code TEXT NOT NULL,
@@ -172,21 +300,23 @@ def init_db():
             received_at TIMESTAMP DEFAULT NULL,
             notes TEXT DEFAULT '',
             FOREIGN KEY (customer_code) REFERENCES customers(customer_code)
-        )
+        );
     """)
 
     # --- Migrations ---
-    cust_columns = [row[1] for row in conn.execute("PRAGMA table_info(customers)").fetchall()]
-    for col, default in [("sea_code", "''"), ("tier", "'bronze'"), ("custom_rate", "NULL"),
-                         ("email", "''"), ("password_hash", "''"),
-                         ("reset_token", "NULL"), ("reset_token_expiry", "NULL"),
-                         ("location_type", "'th'"), ("city", "''")]:
-        if col not in cust_columns:
-            conn.execute(f"ALTER TABLE customers ADD COLUMN {col} TEXT DEFAULT {default}")
+    # One PRAGMA per table; sets give O(1) membership and let us skip the
+    # ALTER loop entirely when every target column is already present.
+    cust_columns = {row[1] for row in conn.execute("PRAGMA table_info(customers)")}
+    cust_defaults = {"sea_code": "''", "tier": "'bronze'", "custom_rate": "NULL",
+                     "email": "''", "password_hash": "''",
+                     "reset_token": "NULL", "reset_token_expiry": "NULL",
+                     "location_type": "'th'", "city": "''"}
+    for col in cust_defaults.keys() - cust_columns:
+        conn.execute(f"ALTER TABLE customers ADD COLUMN {col} TEXT DEFAULT {cust_defaults[col]}")
     if "is_active" not in cust_columns:
         conn.execute("ALTER TABLE customers ADD COLUMN is_active INTEGER DEFAULT 1")
 
-    ship_columns = [row[1] for row in conn.execute("PRAGMA table_info(shipments)").fetchall()]
+    ship_columns = {row[1] for row in conn.execute("PRAGMA table_info(shipments)")}
     if "port" not in ship_columns:
         conn.execute("ALTER TABLE shipments ADD COLUMN port TEXT DEFAULT ''")
     if "photos" not in ship_columns:
@@ -196,6 +326,43 @@ def init_db():
     if "address_locked_by_customer" not in ship_columns:
         conn.execute("ALTER TABLE shipments ADD COLUMN address_locked_by_customer INTEGER DEFAULT 0")
 
+    # Full-text index over the searchable customer columns (external-content
+    # table kept in sync by triggers). Lets search hit the FTS index instead
+    # of a 6-column LIKE scan. Must come after the column migrations:
+    # the index covers sea_code, which legacy databases only gain in
+    # the ALTER loop above, and the one-time rebuild reads it.
+    fts_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customers_fts'"
+    ).fetchone()
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+            customer_code, sea_code,
+            sender_first_name, sender_last_name,
+            receiver_first_name, receiver_last_name,
+            content='customers', content_rowid='id'
+        )
+    """)
+    conn.executescript("""
+        CREATE TRIGGER IF NOT EXISTS customers_fts_ai AFTER INSERT ON customers BEGIN
+            INSERT INTO customers_fts(rowid, customer_code, sea_code, sender_first_name, sender_last_name, receiver_first_name, receiver_last_name)
+            VALUES (new.id, new.customer_code, new.sea_code, new.sender_first_name, new.sender_last_name, new.receiver_first_name, new.receiver_last_name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS customers_fts_ad AFTER DELETE ON customers BEGIN
+            INSERT INTO customers_fts(customers_fts, rowid, customer_code, sea_code, sender_first_name, sender_last_name, receiver_first_name, receiver_last_name)
+            VALUES ('delete', old.id, old.customer_code, old.sea_code, old.sender_first_name, old.sender_last_name, old.receiver_first_name, old.receiver_last_name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS customers_fts_au AFTER UPDATE ON customers BEGIN
+            INSERT INTO customers_fts(customers_fts, rowid, customer_code, sea_code, sender_first_name, sender_last_name, receiver_first_name, receiver_last_name)
+            VALUES ('delete', old.id, old.customer_code, old.sea_code, old.sender_first_name, old.sender_last_name, old.receiver_first_name, old.receiver_last_name);
+            INSERT INTO customers_fts(rowid, customer_code, sea_code, sender_first_name, sender_last_name, receiver_first_name, receiver_last_name)
+            VALUES (new.id, new.customer_code, new.sea_code, new.sender_first_name, new.sender_last_name, new.receiver_first_name, new.receiver_last_name);
+        END;
+    """)
+    if not fts_exists:
+        # Index any rows that existed before the FTS table was added
+        conn.execute("INSERT INTO customers_fts(customers_fts) VALUES('rebuild')")
+
+
     # Migrate existing receiver data to customer_addresses table (one-time)
     existing_addr_count = conn.execute("SELECT COUNT(*) FROM customer_addresses").fetchone()[0]
     if existing_addr_count == 0:
@@ -240,8 +407,12 @@ def save_rates(rates_data):
 
 def get_customer_rate(customer_code):
     conn = get_db()
+    # UNION ALL probes each UNIQUE index directly instead of an OR filter scan
     customer = conn.execute(
-        "SELECT tier, custom_rate FROM customers WHERE customer_code = ? OR sea_code = ?",
+        """SELECT tier, custom_rate FROM customers WHERE customer_code = ?
+           UNION ALL
+           SELECT tier, custom_rate FROM customers WHERE sea_code = ?
+           LIMIT 1""",
         (customer_code, customer_code),
     ).fetchone()
     conn.close()
@@ -263,7 +434,7 @@ def get_admin_by_credentials(username, password):
     conn = get_db()
     admin = conn.execute("SELECT * FROM admins WHERE username = ?", (username,)).fetchone()
     conn.close()
-    if admin and check_password_hash(admin["password_hash"], password):
+    if admin and _check_password_cached(admin["password_hash"], password):
         return admin
     return None
 
@@ -287,7 +458,7 @@ def add_admin(username, password, role="admin"):
     try:
         conn.execute(
             "INSERT INTO admins (username, password_hash, role) VALUES (?, ?, ?)",
-            (username, generate_password_hash(password), role),
+            (username, _hash_password(password), role),
         )
         conn.commit()
         return True, f"เพิ่ม admin '{username}' สำเร็จ"
@@ -363,11 +534,20 @@ def review_rate_request(request_id, reviewer_id, action):
 # ============================================================
 
 
+def _scalar_cursor(conn):
+    """Cursor without the Row factory for existence/COUNT queries — skips
+    building a Row object per fetched value."""
+    cur = conn.cursor()
+    cur.row_factory = None
+    return cur
+
+
 def generate_customer_code():
     conn = get_db()
+    cur = _scalar_cursor(conn)
     while True:
         code = f"US{random.randint(10000, 99999)}"
-        exists = conn.execute("SELECT 1 FROM customers WHERE customer_code = ?", (code,)).fetchone()
+        exists = cur.execute("SELECT 1 FROM customers WHERE customer_code = ?", (code,)).fetchone()
         if not exists:
             conn.close()
             return code
@@ -375,9 +555,10 @@ def generate_customer_code():
 
 def generate_sea_code():
     conn = get_db()
+    cur = _scalar_cursor(conn)
     while True:
         code = f"USS{random.randint(10000, 99999)}"
-        exists = conn.execute("SELECT 1 FROM customers WHERE sea_code = ?", (code,)).fetchone()
+        exists = cur.execute("SELECT 1 FROM customers WHERE sea_code = ?", (code,)).fetchone()
         if not exists:
             conn.close()
             return code
@@ -385,12 +566,13 @@ def generate_sea_code():
 
 def generate_tracking_number():
     conn = get_db()
+    cur = _scalar_cursor(conn)
     while True:
         date_str = datetime.now().strftime("%Y%m%d")
         letter = random.choice(string.ascii_uppercase)
         digits = f"{random.randint(0, 999):03d}"
         tracking = f"TH{date_str}{letter}{digits}"
-        exists = conn.execute("SELECT 1 FROM shipments WHERE tracking_number = ?", (tracking,)).fetchone()
+        exists = cur.execute("SELECT 1 FROM shipments WHERE tracking_number = ?", (tracking,)).fetchone()
         if not exists:
             conn.close()
             return tracking
@@ -408,7 +590,7 @@ def add_customer(location_type="th", city="",
     """Create customer. Returns (success, code_or_error, customer_id)."""
     air_code = generate_customer_code()
     sea_code = generate_sea_code()
-    pw_hash = generate_password_hash(password) if password else ""
+    pw_hash = _hash_password(password) if password else ""
     conn = get_db()
     try:
         conn.execute(
@@ -432,7 +614,10 @@ def add_customer(location_type="th", city="",
 def get_customer_by_code(customer_code):
     conn = get_db()
     customer = conn.execute(
-        "SELECT * FROM customers WHERE customer_code = ? OR sea_code = ?",
+        """SELECT * FROM customers WHERE customer_code = ?
+           UNION ALL
+           SELECT * FROM customers WHERE sea_code = ?
+           LIMIT 1""",
         (customer_code, customer_code),
     ).fetchone()
     conn.close()
@@ -443,13 +628,16 @@ def get_customer_by_credentials(code, password):
     """Verify customer login: code + password. Returns None if inactive."""
     conn = get_db()
     customer = conn.execute(
-        "SELECT * FROM customers WHERE customer_code = ? OR sea_code = ?",
+        """SELECT * FROM customers WHERE customer_code = ?
+           UNION ALL
+           SELECT * FROM customers WHERE sea_code = ?
+           LIMIT 1""",
         (code, code),
     ).fetchone()
     conn.close()
     if not customer or not customer["password_hash"]:
         return None
-    if not check_password_hash(customer["password_hash"], password):
+    if not _check_password_cached(customer["password_hash"], password):
         return None
     if customer["is_active"] == 0:
         return "inactive"
@@ -499,7 +687,7 @@ def reset_customer_password(token, new_password):
     conn = get_db()
     conn.execute(
         "UPDATE customers SET password_hash = ?, reset_token = NULL, reset_token_expiry = NULL WHERE id = ?",
-        (generate_password_hash(new_password), customer["id"]),
+        (_hash_password(new_password), customer["id"]),
     )
     conn.commit()
     conn.close()
@@ -507,19 +695,28 @@ def reset_customer_password(token, new_password):
 
 
 def get_all_customers(search=None, show_inactive=False):
+    """Stream matching customers row-by-row instead of materializing the
+    whole result set. Callers that iterate more than once should wrap in list()."""
     conn = get_db()
-    query = "SELECT * FROM customers WHERE 1=1"
     params = []
-    if not show_inactive:
-        query += " AND (is_active = 1 OR is_active IS NULL)"
     if search:
-        term = f"%{search}%"
-        query += " AND (customer_code LIKE ? OR sea_code LIKE ? OR sender_first_name LIKE ? OR sender_last_name LIKE ? OR receiver_first_name LIKE ? OR receiver_last_name LIKE ?)"
-        params.extend([term, term, term, term, term, term])
-    query += " ORDER BY created_at DESC"
-    customers = conn.execute(query, params).fetchall()
-    conn.close()
-    return customers
+        # Prefix match against the FTS index — avoids the 6-column LIKE scan
+        query = """SELECT c.* FROM customers c
+                   JOIN customers_fts f ON f.rowid = c.id
+                   WHERE customers_fts MATCH ?"""
+        params.append('"%s"*' % search.replace('"', '""'))
+        if not show_inactive:
+            query += " AND (c.is_active = 1 OR c.is_active IS NULL)"
+        query += " ORDER BY c.created_at DESC"
+    else:
+        query = "SELECT * FROM customers WHERE 1=1"
+        if not show_inactive:
+            query += " AND (is_active = 1 OR is_active IS NULL)"
+        query += " ORDER BY created_at DESC"
+    try:
+        yield from conn.execute(query, params)
+    finally:
+        conn.close()
 
 
 def update_customer_tier(customer_code, tier, custom_rate=None):
@@ -583,6 +780,7 @@ def get_shipment_by_tracking(tracking_number):
 
 
 def get_all_shipments(search=None, status_filter=None):
+    """Stream matching shipments row-by-row (see get_all_customers)."""
     conn = get_db()
     query = """SELECT s.*, c.sender_first_name, c.sender_last_name,
                       c.location_type, c.city,
@@ -601,9 +799,10 @@ def get_all_shipments(search=None, status_filter=None):
         query += " AND (s.tracking_number LIKE ? OR s.customer_code LIKE ?)"
         params.extend([term, term])
     query += " ORDER BY s.updated_at DESC"
-    shipments = conn.execute(query, params).fetchall()
-    conn.close()
-    return shipments
+    try:
+        yield from conn.execute(query, params)
+    finally:
+        conn.close()
 
 
 def update_shipment_status(shipment_id, new_status):
@@ -616,17 +815,32 @@ def update_shipment_status(shipment_id, new_status):
     conn.close()
 
 
+# SQLite's default bound-variable limit is 999; stay under it per statement
+_BULK_UPDATE_CHUNK = 900
+
+
 def bulk_update_shipment_status(shipment_ids, new_status):
+    """Update status for many shipments. Returns the list of IDs that were
+    actually updated."""
+    shipment_ids = list(shipment_ids)
     if not shipment_ids:
-        return
+        return []
+    if len(shipment_ids) == 1:
+        update_shipment_status(shipment_ids[0], new_status)
+        return shipment_ids
     conn = get_db()
-    placeholders = ",".join("?" for _ in shipment_ids)
-    conn.execute(
-        f"UPDATE shipments SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id IN ({placeholders})",
-        [new_status] + list(shipment_ids),
-    )
+    updated = []
+    for i in range(0, len(shipment_ids), _BULK_UPDATE_CHUNK):
+        chunk = shipment_ids[i:i + _BULK_UPDATE_CHUNK]
+        placeholders = ",".join("?" for _ in chunk)
+        rows = conn.execute(
+            f"UPDATE shipments SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id IN ({placeholders}) RETURNING id",
+            [new_status] + chunk,
+        ).fetchall()
+        updated.extend(r["id"] for r in rows)
     conn.commit()
     conn.close()
+    return updated
 
 
 # ============================================================
@@ -692,7 +906,9 @@ def delete_customer_address(address_id):
 
 def get_address_count(customer_id):
     conn = get_db()
-    count = conn.execute("SELECT COUNT(*) FROM customer_addresses WHERE customer_id = ?", (customer_id,)).fetchone()[0]
+    count = _scalar_cursor(conn).execute(
+        "SELECT COUNT(*) FROM customer_addresses WHERE customer_id = ?", (customer_id,)
+    ).fetchone()[0]
     conn.close()
     return count
 
@@ -746,7 +962,7 @@ def update_customer_info(customer_code, **fields):
 
 def admin_reset_customer_password(customer_code, new_password):
     conn = get_db()
-    pw_hash = generate_password_hash(new_password)
+    pw_hash = _hash_password(new_password)
     conn.execute(
         "UPDATE customers SET password_hash = ?, reset_token = NULL, reset_token_expiry = NULL WHERE customer_code = ?",
         (pw_hash, customer_code),
@@ -813,6 +1029,7 @@ def delete_inbound_package(inbound_id):
 
 
 def get_all_inbound_packages(search=None, status_filter=None):
+    """Stream matching inbound packages row-by-row (see get_all_customers)."""
     conn = get_db()
     query = """SELECT ip.*, c.sender_first_name, c.sender_last_name,
                       c.location_type, c.city
@@ -828,9 +1045,10 @@ def get_all_inbound_packages(search=None, status_filter=None):
         query += " AND (ip.carrier_tracking_number LIKE ? OR ip.customer_code LIKE ? OR ip.description LIKE ?)"
         params.extend([term, term, term])
     query += " ORDER BY ip.submitted_at DESC"
-    packages = conn.execute(query, params).fetchall()
-    conn.close()
-    return packages
+    try:
+        yield from conn.execute(query, params)
+    finally:
+        conn.close()
 
 
 def update_inbound_status(inbound_id, new_status, notes=""):
@@ -909,14 +1127,28 @@ def seed_mock_addresses(customer_id):
 # ============================================================
 
 
-def get_stats():
+# Dashboard polling hits get_stats constantly; cache results for a few
+# seconds and refresh stale values in a background thread so callers
+# never wait on the COUNT scans (stale-while-revalidate).
+_STATS_TTL = float(os.environ.get("STATS_CACHE_TTL", "10"))
+_stats_cache = {"value": None, "ts": 0.0, "refreshing": False}
+_stats_lock = threading.Lock()
+
+
+def _compute_stats():
+    # Conditional aggregation shares one scan over shipments instead of
+    # four separate COUNT queries; customers stays a scalar subquery.
     conn = get_db()
-    total_customers = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
-    total_shipments = conn.execute("SELECT COUNT(*) FROM shipments").fetchone()[0]
-    pending = conn.execute("SELECT COUNT(*) FROM shipments WHERE status = 'pending'").fetchone()[0]
-    in_transit = conn.execute("SELECT COUNT(*) FROM shipments WHERE status IN ('picked_up', 'in_transit', 'customs')").fetchone()[0]
-    delivered = conn.execute("SELECT COUNT(*) FROM shipments WHERE status = 'delivered'").fetchone()[0]
+    row = _scalar_cursor(conn).execute(
+        """SELECT (SELECT COUNT(*) FROM customers),
+                  COUNT(*),
+                  COALESCE(SUM(status = 'pending'), 0),
+                  COALESCE(SUM(status IN ('picked_up', 'in_transit', 'customs')), 0),
+                  COALESCE(SUM(status = 'delivered'), 0)
+           FROM shipments"""
+    ).fetchone()
     conn.close()
+    total_customers, total_shipments, pending, in_transit, delivered = row
     return {
         "total_customers": total_customers,
         "total_shipments": total_shipments,
@@ -924,3 +1156,32 @@ def get_stats():
         "in_transit": in_transit,
         "delivered": delivered,
     }
+
+
+def _refresh_stats():
+    try:
+        value = _compute_stats()
+        with _stats_lock:
+            _stats_cache["value"] = value
+            _stats_cache["ts"] = time.monotonic()
+    finally:
+        with _stats_lock:
+            _stats_cache["refreshing"] = False
+
+
+def get_stats():
+    now = time.monotonic()
+    with _stats_lock:
+        cached = _stats_cache["value"]
+        stale = cached is None or now - _stats_cache["ts"] >= _STATS_TTL
+        if cached is not None and stale and not _stats_cache["refreshing"]:
+            _stats_cache["refreshing"] = True
+            threading.Thread(target=_refresh_stats, daemon=True).start()
+    if cached is not None:
+        return cached
+    # Cold miss — compute synchronously once
+    value = _compute_stats()
+    with _stats_lock:
+        _stats_cache["value"] = value
+        _stats_cache["ts"] = time.monotonic()
+    return value
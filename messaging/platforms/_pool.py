@@ -0,0 +1,39 @@
+"""
+Shared bounded thread pool for parallel platform I/O.
+
+Outbound sends and profile fetches are network-bound; fanning them out
+through one capped executor turns N sequential round-trips into ~max(RTT)
+without letting a burst open unbounded connections.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("MSG_CONCURRENCY", "8")))
+
+
+def send_many(adapter, jobs):
+    """Send several messages in parallel through one adapter.
+
+    jobs is an iterable of kwargs dicts for adapter.send_message.
+    Returns the (success, platform_message_id_or_error) tuples in job order.
+    """
+    futures = [executor.submit(adapter.send_message, **job) for job in jobs]
+    return [f.result() for f in futures]
+
+
+def fetch_profiles(adapter, user_ids):
+    """Fetch user profiles for several platform user IDs in parallel.
+
+    Returns {user_id: profile_dict}; failed lookups fall back to the
+    adapter's empty-profile value.
+    """
+    user_ids = list(user_ids)
+    futures = {uid: executor.submit(adapter.get_user_profile, uid) for uid in user_ids}
+    profiles = {}
+    for uid, future in futures.items():
+        try:
+            profiles[uid] = future.result()
+        except Exception:
+            profiles[uid] = {"display_name": "", "avatar_url": ""}
+    return profiles
@@ -3,6 +3,37 @@ Base class for platform adapters.
 """
 
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, asdict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# One pooled session shared by every adapter instance. Adapters are
+# constructed per webhook/send, so a per-instance session would never get
+# to reuse its TCP/TLS connections to graph.facebook.com / api.line.me.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=50))
+
+
+@dataclass(slots=True)
+class NormalizedMessage:
+    """One platform-agnostic inbound message.
+
+    Slotted so a webhook burst of hundreds of events doesn't allocate a
+    __dict__ per message; consumers use attribute access and call
+    to_dict() only where a plain dict is genuinely needed.
+    """
+
+    platform_user_id: str = ""
+    display_name: str = ""
+    avatar_url: str = ""
+    message_type: str = "text"
+    content: str = ""
+    metadata: dict = field(default_factory=dict)
+    platform_message_id: str = ""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
 
 
 class BasePlatformAdapter(ABC):
@@ -10,6 +41,7 @@ class BasePlatformAdapter(ABC):
 
     def __init__(self, credentials: dict):
         self.credentials = credentials
+        self.session = _session
 
     @abstractmethod
     def send_message(self, recipient_id: str, message_type: str, content: str) -> tuple[bool, str]:
@@ -19,22 +51,21 @@ class BasePlatformAdapter(ABC):
         """
         pass
 
+    def send_messages(self, recipient_ids: list[str], message_type: str = "text", content: str = "") -> list[tuple[bool, str]]:
+        """Send the same message to many recipients.
+
+        Returns one (success, platform_message_id_or_error) per recipient,
+        in order. Adapters override this with their platform's bulk API
+        where one exists; the default just loops.
+        """
+        return [self.send_message(rid, message_type=message_type, content=content) for rid in recipient_ids]
+
     @abstractmethod
     def verify_webhook(self, request) -> bool:
         """Verify webhook signature."""
         pass
 
     @abstractmethod
-    def parse_webhook(self, request) -> list[dict]:
-        """Parse webhook payload into normalized message dicts.
-
-        Each dict should have:
-        - platform_user_id: str
-        - display_name: str (if available)
-        - avatar_url: str (if available)
-        - message_type: str (text, image, sticker, file, location)
-        - content: str
-        - metadata: dict
-        - platform_message_id: str
-        """
+    def parse_webhook(self, request) -> list["NormalizedMessage"]:
+        """Parse webhook payload into NormalizedMessage records."""
         pass
@@ -5,9 +5,11 @@ All endpoints prefixed with /api/messaging/
 
 import json
 import os
+import re
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
-from flask import request, session, jsonify
+from flask import request, session, jsonify, g
 
 # Media directory: use persistent disk in production, local static/media in development
 _DATA_DIR = os.environ.get("DATA_DIR", "")
@@ -18,15 +20,17 @@ else:
 from messaging import messaging_bp
 from messaging_db import (
     get_admin_org_id, get_org_by_id, update_org,
+    get_org_settings, update_org_setting,
     get_channels_for_org, get_channel, create_channel, update_channel, delete_channel,
     get_ai_providers_for_org, get_ai_provider, create_ai_provider, update_ai_provider, delete_ai_provider,
     get_conversations_for_org, get_conversation, update_conversation,
-    get_messages_for_conversation, mark_messages_read,
+    get_messages_for_conversation, mark_messages_read_async,
     get_contacts_for_org, get_contact, update_contact,
     get_templates_for_org, create_template, update_template, delete_template, increment_template_usage,
-    get_conversation_tags, add_conversation_tag, remove_conversation_tag,
+    get_conversation_tags, get_tags_for_conversations,
+    add_conversation_tag, remove_conversation_tag,
     get_notifications, mark_notification_read, mark_all_notifications_read,
-    get_messaging_overview, get_org_admins,
+    get_messaging_overview, get_org_admins, get_all_messages_for_org,
 )
 from messaging.services.channel_service import (
     CHANNEL_TYPES, save_credentials, get_masked_credentials, verify_channel_connection,
@@ -35,8 +39,95 @@ from messaging.services.ai_service import (
     AI_PROVIDERS, test_api_key, generate_suggestion,
 )
 from messaging.services.message_service import send_admin_reply
+from messaging.platforms.line_adapter import LineAdapter
+from messaging.platforms.facebook_adapter import FacebookAdapter
+from messaging.platforms.instagram_adapter import InstagramAdapter
 from messaging.utils.encryption import encrypt_json, mask_secret
 
+PLATFORM_ADAPTERS = {
+    "line": LineAdapter,
+    "facebook": FacebookAdapter,
+    "instagram": InstagramAdapter,
+}
+
+
+# Characters stripped from contact names when building export filenames.
+# \w covers unicode letters/digits plus underscore — the same set the old
+# per-character isalnum() loop kept, but substituted in one C-level pass.
+_UNSAFE_CHARS = re.compile(r"[^\w \-]")
+
+# Day-of-week labels indexed by strftime('%w') (0=Sunday)
+_DAY_NAMES = ("อาทิตย์", "จันทร์", "อังคาร", "พุธ", "พฤหัสบดี", "ศุกร์", "เสาร์")
+
+# Product-category keywords for the customer-behavior analytics endpoint.
+# Counting happens entirely in SQL (see _CATEGORY_COUNT_SQL below) so the
+# message bodies never leave the database.
+_KEYWORD_CATEGORIES = {
+    "อิเล็กทรอนิกส์": ["โทรศัพท์", "มือถือ", "คอม", "โน๊ตบุ๊ค", "laptop", "phone", "tablet", "ipad", "iphone", "กล้อง", "camera", "หูฟัง"],
+    "แฟชั่น/เสื้อผ้า": ["เสื้อ", "กางเกง", "รองเท้า", "กระเป๋า", "เครื่องประดับ", "นาฬิกา", "แว่น", "shoes", "bag", "watch", "clothes"],
+    "อาหาร/เครื่องดื่ม": ["อาหาร", "ขนม", "เครื่องดื่ม", "กาแฟ", "ชา", "food", "snack", "coffee", "supplement", "วิตามิน"],
+    "สุขภาพ/ความงาม": ["ครีม", "เซรั่ม", "สกินแคร์", "skincare", "อาหารเสริม", "ยา", "cosmetic", "เครื่องสำอาง", "beauty"],
+    "ของใช้ในบ้าน": ["เฟอร์นิเจอร์", "furniture", "โซฟา", "เตียง", "ตู้", "โต๊ะ", "ของตกแต่ง", "home"],
+    "ชิ้นส่วน/อะไหล่": ["อะไหล่", "parts", "spare", "ชิ้นส่วน", "เครื่องจักร", "machine"],
+}
+
+
+def _build_category_count_sql():
+    """One UNION ALL query counting keyword hits per category in SQL.
+
+    Each branch counts the recent contact messages matching any of its
+    category's keywords via LIKE — substring semantics, which FTS5's
+    tokenizers can't give for unspaced Thai text. The keyword table is
+    static, so the SQL and its pattern parameters are built once.
+    """
+    branches = []
+    params = []
+    for cat, keywords in _KEYWORD_CATEGORIES.items():
+        likes = " OR ".join(["content LIKE ?"] * len(keywords))
+        branches.append(f"SELECT ? AS category, COUNT(*) AS hits FROM recent WHERE {likes}")
+        params.append(cat)
+        params.extend(f"%{kw}%" for kw in keywords)
+    sql = (
+        "WITH recent AS ("
+        " SELECT content FROM messages"
+        " WHERE org_id = ? AND sender_type = 'contact' AND message_type = 'text'"
+        " ORDER BY created_at DESC LIMIT 500) "
+        + " UNION ALL ".join(branches)
+    )
+    return sql, tuple(params)
+
+
+_CATEGORY_COUNT_SQL, _CATEGORY_COUNT_PARAMS = _build_category_count_sql()
+
+# The behavior-analytics endpoint runs six independent SELECTs; they go
+# through this pool so their latencies overlap instead of adding up.
+# SQLite connections can't cross threads, so each task opens its own.
+_analytics_pool = ThreadPoolExecutor(max_workers=6)
+
+
+def _analytics_rows(sql, params):
+    from database import get_db
+
+    conn = get_db()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def _conditional(resp):
+    """Attach a content-derived weak ETag and honor If-None-Match.
+
+    Templates, team and /me are refetched on every admin page load but
+    rarely change; a revalidating browser gets a bodyless 304 instead of
+    the full payload. The validator is hashed from the body because none
+    of the underlying tables carry an updated_at to version against.
+    """
+    resp.add_etag(weak=True)
+    resp.cache_control.private = True
+    resp.cache_control.max_age = 0
+    return resp.make_conditional(request)
+
 
 def _row_to_dict(row):
     """Convert sqlite3.Row to dict."""
@@ -46,7 +137,13 @@ def _row_to_dict(row):
 
 
 def _rows_to_list(rows):
-    return [dict(r) for r in rows]
+    # All rows share one column set — resolve the keys once and zip each
+    # row as a plain sequence instead of going through the Row mapping
+    # protocol (and a keys() call) per row.
+    if not rows:
+        return []
+    keys = rows[0].keys()
+    return [dict(zip(keys, row)) for row in rows]
 
 
 # ============================================================
@@ -54,21 +151,35 @@ def _rows_to_list(rows):
 # ============================================================
 
 
+@messaging_bp.before_request
+def _load_admin_identity():
+    """Resolve the session admin once per request and reject
+    unauthenticated API calls before any view code runs.
+
+    Webhook routes share this blueprint and stay public — only
+    /api/messaging/ paths are gated here.
+    """
+    g.admin_id = session.get("admin_id")
+    if request.path.startswith("/api/messaging/") and not g.admin_id:
+        return jsonify({"error": "unauthorized"}), 401
+
+
 def api_admin_required(f):
+    # Auth is enforced in _load_admin_identity; the decorator stays as a
+    # marker so endpoints read the same and non-API views can reuse it
     @wraps(f)
     def decorated(*args, **kwargs):
-        if not session.get("admin_id"):
+        if not g.get("admin_id"):
             return jsonify({"error": "unauthorized"}), 401
         return f(*args, **kwargs)
     return decorated
 
 
 def _get_org_id():
-    """Get current admin's org_id from session."""
-    admin_id = session.get("admin_id")
-    if not admin_id:
-        return None
-    return get_admin_org_id(admin_id)
+    """Get current admin's org_id, resolved once per request on g."""
+    if "org_id" not in g:
+        g.org_id = get_admin_org_id(g.admin_id) if g.get("admin_id") else None
+    return g.org_id
 
 
 # ============================================================
@@ -301,11 +412,11 @@ def api_delete_ai_provider(provider_id):
 @messaging_bp.route("/api/messaging/ai-providers/<int:provider_id>/test", methods=["POST"])
 @api_admin_required
 def api_test_ai_provider(provider_id):
-    from messaging.utils.encryption import decrypt_json
+    from messaging.services.ai_service import get_provider_api_key
     provider = get_ai_provider(provider_id)
     if not provider:
         return jsonify({"error": "Provider not found"}), 404
-    api_key = decrypt_json(provider["encrypted_api_key"]).get("api_key", "")
+    api_key = get_provider_api_key(provider["encrypted_api_key"])
     success, message = test_api_key(provider["provider_type"], api_key)
     return jsonify({"success": success, "message": message})
 
@@ -350,13 +461,19 @@ def api_list_conversations():
     search = request.args.get("search")
     limit = request.args.get("limit", 50, type=int)
     offset = request.args.get("offset", 0, type=int)
+    # Keyset paging: pass the last conversation id of the previous page
+    # as ?after= instead of a growing offset
+    after_id = request.args.get("after", type=int)
     conversations = get_conversations_for_org(
         org_id, status=status, channel_id=channel_id,
         assigned_admin_id=assigned, search=search, limit=limit, offset=offset,
+        after_id=after_id,
     )
     result = _rows_to_list(conversations)
+    # One batched query for every conversation's tags instead of one per row
+    tags_map = get_tags_for_conversations([conv["id"] for conv in result])
     for conv in result:
-        conv["tags"] = get_conversation_tags(conv["id"])
+        conv["tags"] = tags_map.get(conv["id"], [])
     return jsonify(result)
 
 
@@ -432,7 +549,8 @@ def api_reopen_conversation(conversation_id):
 @messaging_bp.route("/api/messaging/conversations/<int:conversation_id>/read", methods=["POST"])
 @api_admin_required
 def api_mark_read(conversation_id):
-    mark_messages_read(conversation_id)
+    # Batched in the background — one UPDATE covers a burst of mark-reads
+    mark_messages_read_async(conversation_id)
     return jsonify({"success": True})
 
 
@@ -488,7 +606,12 @@ def api_list_contacts():
     search = request.args.get("search")
     limit = request.args.get("limit", 50, type=int)
     offset = request.args.get("offset", 0, type=int)
-    contacts = get_contacts_for_org(org_id, search=search, limit=limit, offset=offset)
+    # Keyset paging: pass the last contact id of the previous page as
+    # ?after= instead of a growing offset; the next cursor is the id of
+    # the last row returned
+    after_id = request.args.get("after", type=int)
+    tag = request.args.get("tag")
+    contacts = get_contacts_for_org(org_id, search=search, limit=limit, offset=offset, after_id=after_id, tag=tag)
     return jsonify(_rows_to_list(contacts))
 
 
@@ -520,7 +643,7 @@ def api_list_templates():
     org_id = _get_org_id()
     category = request.args.get("category")
     templates = get_templates_for_org(org_id, category=category)
-    return jsonify(_rows_to_list(templates))
+    return _conditional(jsonify(_rows_to_list(templates)))
 
 
 @messaging_bp.route("/api/messaging/templates", methods=["POST"])
@@ -565,7 +688,8 @@ def api_delete_template(template_id):
 def api_list_notifications():
     admin_id = session["admin_id"]
     unread_only = request.args.get("unread") == "1"
-    notifications = get_notifications(admin_id, unread_only=unread_only)
+    after_id = request.args.get("after", type=int)
+    notifications = get_notifications(admin_id, unread_only=unread_only, after_id=after_id)
     return jsonify(_rows_to_list(notifications))
 
 
@@ -607,7 +731,7 @@ def api_analytics_overview():
 def api_list_team():
     org_id = _get_org_id()
     admins = get_org_admins(org_id)
-    return jsonify(_rows_to_list(admins))
+    return _conditional(jsonify(_rows_to_list(admins)))
 
 
 # ============================================================
@@ -621,13 +745,13 @@ def api_me():
     admin_id = session["admin_id"]
     org_id = _get_org_id()
     org = get_org_by_id(org_id)
-    return jsonify({
+    return _conditional(jsonify({
         "admin_id": admin_id,
         "username": session.get("admin_username"),
         "role": session.get("admin_role"),
         "org_id": org_id,
         "org_name": org["name"] if org else "",
-    })
+    }))
 
 
 # ============================================================
@@ -635,26 +759,47 @@ def api_me():
 # ============================================================
 
 
+# Keep-alive session for the LINE Content API — media fetches during a
+# chat-scroll burst reuse one TCP/TLS connection instead of paying the
+# handshake per file. Same pooling setup as the platform adapters share.
+_line_media_session = requests.Session()
+_line_media_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=20))
+
+
+def _set_media_cache_headers(resp, message_id):
+    """LINE content is immutable per message_id, so browsers can keep it
+    indefinitely. private, not public: the proxy is admin-gated, and a
+    shared cache must not serve one admin's media to another session."""
+    resp.set_etag(message_id)
+    resp.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+
+
 @messaging_bp.route("/api/messaging/media/line/<message_id>")
 @api_admin_required
 def api_line_media_proxy(message_id):
     """Proxy LINE image/video content to frontend."""
-    from flask import send_file
+    from flask import Response, send_file, stream_with_context
     from messaging.services.channel_service import load_credentials
 
     channel_id = request.args.get("channel_id", type=int)
     if not channel_id:
         return jsonify({"error": "channel_id required"}), 400
 
-    # Check cache first
+    # Check cache first — entries are stored with a type extension, so
+    # probe the known variants
     os.makedirs(MEDIA_DIR, exist_ok=True)
     cache_path = os.path.join(MEDIA_DIR, f"line_{message_id}")
 
-    if os.path.exists(cache_path):
-        # Guess content type from first bytes or default
-        import mimetypes
-        ct = mimetypes.guess_type(cache_path)[0] or "application/octet-stream"
-        return send_file(cache_path, mimetype=ct)
+    import mimetypes
+    for ext in (".jpg", ".mp4", ""):
+        cached = cache_path + ext
+        if os.path.exists(cached):
+            ct = mimetypes.guess_type(cached)[0] or "application/octet-stream"
+            file_resp = send_file(cached, mimetype=ct)
+            _set_media_cache_headers(file_resp, message_id)
+            # Honors If-None-Match — a revalidating browser gets 304
+            # with no body
+            return file_resp.make_conditional(request)
 
     # Fetch from LINE Content API (works for images, videos, audio, files)
     creds = load_credentials(channel_id)
@@ -662,7 +807,7 @@ def api_line_media_proxy(message_id):
         return jsonify({"error": "No credentials"}), 404
 
     token = creds.get("channel_access_token", "")
-    resp = requests.get(
+    resp = _line_media_session.get(
         f"https://api-data.line.me/v2/bot/message/{message_id}/content",
         headers={"Authorization": f"Bearer {token}"},
         timeout=30,
@@ -681,13 +826,29 @@ def api_line_media_proxy(message_id):
     elif "video" in content_type:
         ext = ".mp4"
     cache_path_with_ext = cache_path + ext
+    part_path = cache_path_with_ext + ".part"
 
-    # Save to cache
-    with open(cache_path_with_ext, "wb") as f:
-        for chunk in resp.iter_content(chunk_size=8192):
-            f.write(chunk)
+    def generate():
+        # Tee LINE's bytes to the client and the cache file in one pass;
+        # the first byte goes out as soon as LINE sends it. The cache
+        # entry only becomes visible via rename once fully written, so an
+        # aborted download never leaves a truncated file behind.
+        try:
+            with open(part_path, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=65536):
+                    f.write(chunk)
+                    yield chunk
+            os.replace(part_path, cache_path_with_ext)
+        except BaseException:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            raise
 
-    return send_file(cache_path_with_ext, mimetype=content_type)
+    stream_resp = Response(stream_with_context(generate()), mimetype=content_type)
+    _set_media_cache_headers(stream_resp, message_id)
+    return stream_resp
 
 
 # ============================================================
@@ -695,42 +856,46 @@ def api_line_media_proxy(message_id):
 # ============================================================
 
 
+class _Echo:
+    """File-like object whose write() just hands the row back, so
+    csv.writer can feed a streaming response instead of a buffer."""
+
+    def write(self, value):
+        return value
+
+
 @messaging_bp.route("/api/messaging/conversations/<int:conversation_id>/export")
 @api_admin_required
 def api_export_conversation(conversation_id):
     """Export a single conversation's messages as CSV."""
     import csv
-    import io
-    from flask import Response
+    from flask import Response, stream_with_context
 
-    messages = get_messages_for_conversation(conversation_id, limit=10000)
     conv = get_conversation(conversation_id)
     contact_name = conv["contact_name"] if conv else "unknown"
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Date", "Time", "Sender Type", "Sender", "Message Type", "Content"])
-
-    for msg in messages:
-        m = dict(msg)
-        dt = m.get("created_at") or ""
-        date_part = dt[:10] if len(dt) >= 10 else dt
-        time_part = dt[11:19] if len(dt) >= 19 else ""
-        sender = ""
-        if m.get("sender_type") == "contact":
-            sender = contact_name
-        elif m.get("sender_type") == "admin":
-            sender = m.get("admin_username") or m.get("admin_display_name") or f"Admin #{m.get('sender_id', '')}"
-        elif m.get("sender_type") == "ai":
-            sender = "AI Auto-Reply"
-        writer.writerow([date_part, time_part, m.get("sender_type", ""), sender, m.get("message_type", ""), m.get("content", "")])
-
-    csv_content = output.getvalue()
-    output.close()
-
-    safe_name = "".join(c for c in contact_name if c.isalnum() or c in (' ', '_', '-')).strip() or "unknown"
+    def generate():
+        writer = csv.writer(_Echo())
+        yield writer.writerow(["Date", "Time", "Sender Type", "Sender", "Message Type", "Content"])
+        for m in get_messages_for_conversation(conversation_id, limit=10000):
+            dt = m["created_at"] or ""
+            date_part = dt[:10] if len(dt) >= 10 else dt
+            time_part = dt[11:19] if len(dt) >= 19 else ""
+            sender = ""
+            if m["sender_type"] == "contact":
+                sender = contact_name
+            elif m["sender_type"] == "admin":
+                # admin_username/display_name come from the LEFT JOIN on
+                # admins in the message query; NULL (deleted admin) falls
+                # through to the numeric label
+                sender = m["admin_username"] or m["admin_display_name"] or f"Admin #{m['sender_id']}"
+            elif m["sender_type"] == "ai":
+                sender = "AI Auto-Reply"
+            yield writer.writerow([date_part, time_part, m["sender_type"] or "", sender, m["message_type"] or "", m["content"] or ""])
+
+    safe_name = _UNSAFE_CHARS.sub("", contact_name).strip() or "unknown"
     return Response(
-        csv_content,
+        stream_with_context(generate()),
         mimetype="text/csv",
         headers={"Content-Disposition": f"attachment; filename=conversation_{conversation_id}_{safe_name}.csv"},
     )
@@ -741,42 +906,34 @@ def api_export_conversation(conversation_id):
 def api_export_all_conversations():
     """Export ALL conversations as CSV."""
     import csv
-    import io
-    from flask import Response
+    from flask import Response, stream_with_context
 
     org_id = _get_org_id()
-    conversations = get_conversations_for_org(org_id, limit=10000)
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Conversation ID", "Contact", "Channel", "Status", "Priority", "Date", "Time", "Sender Type", "Sender", "Message Type", "Content"])
-
-    for conv in conversations:
-        conv_dict = dict(conv)
-        messages = get_messages_for_conversation(conv_dict["id"], limit=10000)
-        for msg in messages:
-            m = dict(msg)
-            dt = m.get("created_at") or ""
+
+    def generate():
+        writer = csv.writer(_Echo())
+        yield writer.writerow(["Conversation ID", "Contact", "Channel", "Status", "Priority", "Date", "Time", "Sender Type", "Sender", "Message Type", "Content"])
+        # One JOIN query for the whole org instead of a message fetch per
+        # conversation — rows stream from the cursor straight to the client
+        for m in get_all_messages_for_org(org_id):
+            dt = m["created_at"] or ""
             date_part = dt[:10] if len(dt) >= 10 else dt
             time_part = dt[11:19] if len(dt) >= 19 else ""
             sender = ""
-            if m.get("sender_type") == "contact":
-                sender = conv_dict.get("contact_name", "")
-            elif m.get("sender_type") == "admin":
-                sender = m.get("admin_username") or m.get("admin_display_name") or f"Admin #{m.get('sender_id', '')}"
-            elif m.get("sender_type") == "ai":
+            if m["sender_type"] == "contact":
+                sender = m["contact_name"] or ""
+            elif m["sender_type"] == "admin":
+                sender = m["admin_username"] or m["admin_display_name"] or f"Admin #{m['sender_id']}"
+            elif m["sender_type"] == "ai":
                 sender = "AI Auto-Reply"
-            writer.writerow([
-                conv_dict["id"], conv_dict.get("contact_name", ""), conv_dict.get("channel_type", ""),
-                conv_dict.get("status", ""), conv_dict.get("priority", "normal"),
-                date_part, time_part, m.get("sender_type", ""), sender, m.get("message_type", ""), m.get("content", ""),
+            yield writer.writerow([
+                m["conversation_id"], m["contact_name"] or "", m["channel_type"] or "",
+                m["status"] or "", m["priority"] or "normal",
+                date_part, time_part, m["sender_type"] or "", sender, m["message_type"] or "", m["content"] or "",
             ])
 
-    csv_content = output.getvalue()
-    output.close()
-
     return Response(
-        csv_content,
+        stream_with_context(generate()),
         mimetype="text/csv",
         headers={"Content-Disposition": "attachment; filename=all_conversations_export.csv"},
     )
@@ -791,9 +948,11 @@ def api_export_all_conversations():
 @api_admin_required
 def api_upload_media(conversation_id):
     """Upload an image or video and send it to the customer."""
+    import hashlib
     import uuid
     import traceback
     from messaging_db import add_message
+    from messaging.services.channel_service import load_credentials
 
     try:
         if "file" not in request.files:
@@ -819,12 +978,24 @@ def api_upload_media(conversation_id):
         else:
             return jsonify({"error": "Only image and video files are supported"}), 400
 
-        # Save file locally (persistent disk in production)
+        # Save file locally (persistent disk in production), named by
+        # content hash: the upload is hashed while it's written, and a
+        # re-sent asset (logo, receipt template) maps to the same name so
+        # the media dir holds one copy per unique file
         os.makedirs(MEDIA_DIR, exist_ok=True)
         ext = os.path.splitext(file.filename)[1] or (".jpg" if msg_type == "image" else ".mp4")
-        filename = f"upload_{uuid.uuid4().hex}{ext}"
+        hasher = hashlib.blake2b(digest_size=16)
+        tmp_path = os.path.join(MEDIA_DIR, f"upload_{uuid.uuid4().hex}.part")
+        with open(tmp_path, "wb") as f:
+            while chunk := file.stream.read(65536):
+                hasher.update(chunk)
+                f.write(chunk)
+        filename = f"upload_{hasher.hexdigest()}{ext}"
         filepath = os.path.join(MEDIA_DIR, filename)
-        file.save(filepath)
+        if os.path.exists(filepath):
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, filepath)
 
         # Get conversation info
         conv = get_conversation(conversation_id)
@@ -856,12 +1027,7 @@ def api_upload_media(conversation_id):
 
         if creds:
             try:
-                from messaging.platforms.line_adapter import LineAdapter
-                from messaging.platforms.facebook_adapter import FacebookAdapter
-                from messaging.platforms.instagram_adapter import InstagramAdapter
-
-                adapters = {"line": LineAdapter, "facebook": FacebookAdapter, "instagram": InstagramAdapter}
-                adapter_class = adapters.get(channel["channel_type"])
+                adapter_class = PLATFORM_ADAPTERS.get(channel["channel_type"])
 
                 if adapter_class:
                     adapter = adapter_class(creds)
@@ -921,10 +1087,9 @@ def api_upload_media(conversation_id):
 def api_get_ai_toggle():
     """Get AI auto-reply setting."""
     org_id = _get_org_id()
-    org = get_org_by_id(org_id)
-    if not org:
+    settings = get_org_settings(org_id)
+    if settings is None:
         return jsonify({"error": "Org not found"}), 404
-    settings = json.loads(dict(org).get("settings_json") or "{}")
     return jsonify({"ai_auto_reply_enabled": settings.get("ai_auto_reply_enabled", True)})
 
 
@@ -933,15 +1098,11 @@ def api_get_ai_toggle():
 def api_set_ai_toggle():
     """Toggle AI auto-reply on/off."""
     org_id = _get_org_id()
-    org = get_org_by_id(org_id)
-    if not org:
-        return jsonify({"error": "Org not found"}), 404
     data = request.get_json()
-    enabled = data.get("ai_auto_reply_enabled", True)
-    settings = json.loads(dict(org).get("settings_json") or "{}")
-    settings["ai_auto_reply_enabled"] = bool(enabled)
-    update_org(org_id, settings_json=json.dumps(settings))
-    return jsonify({"success": True, "ai_auto_reply_enabled": bool(enabled)})
+    enabled = bool(data.get("ai_auto_reply_enabled", True))
+    if not update_org_setting(org_id, "ai_auto_reply_enabled", enabled):
+        return jsonify({"error": "Org not found"}), 404
+    return jsonify({"success": True, "ai_auto_reply_enabled": enabled})
 
 
 # ============================================================
@@ -954,10 +1115,9 @@ def api_set_ai_toggle():
 def api_get_public_url():
     """Get the public base URL setting."""
     org_id = _get_org_id()
-    org = get_org_by_id(org_id)
-    if not org:
+    settings = get_org_settings(org_id)
+    if settings is None:
         return jsonify({"error": "Org not found"}), 404
-    settings = json.loads(dict(org).get("settings_json") or "{}")
     return jsonify({"public_base_url": settings.get("public_base_url", "")})
 
 
@@ -966,14 +1126,10 @@ def api_get_public_url():
 def api_set_public_url():
     """Set the public base URL (Cloudflare Tunnel, ngrok, etc.)."""
     org_id = _get_org_id()
-    org = get_org_by_id(org_id)
-    if not org:
-        return jsonify({"error": "Org not found"}), 404
     data = request.get_json()
     url = (data.get("public_base_url") or "").strip().rstrip("/")
-    settings = json.loads(dict(org).get("settings_json") or "{}")
-    settings["public_base_url"] = url
-    update_org(org_id, settings_json=json.dumps(settings))
+    if not update_org_setting(org_id, "public_base_url", url):
+        return jsonify({"error": "Org not found"}), 404
     return jsonify({"success": True, "public_base_url": url})
 
 
@@ -986,107 +1142,105 @@ def api_set_public_url():
 @api_admin_required
 def api_customer_behavior():
     """Get customer behavior analytics: message times, frequency, product categories."""
-    from database import get_db
-
     org_id = _get_org_id()
-    conn = get_db()
+
+    # The six sections are independent reads — run them concurrently on
+    # _analytics_pool (one connection per task) so the endpoint's wall
+    # time is roughly the slowest query, not the sum of all six.
 
     # 1) Message count by hour of day (when do customers message?)
-    hourly = conn.execute("""
+    hourly_f = _analytics_pool.submit(_analytics_rows, """
         SELECT CAST(strftime('%%H', m.created_at) AS INTEGER) AS hour, COUNT(*) AS count
         FROM messages m
         JOIN conversations c ON m.conversation_id = c.id
         WHERE m.org_id = ? AND m.sender_type = 'contact'
         GROUP BY hour ORDER BY hour
-    """, (org_id,)).fetchall()
-    hourly_data = {h["hour"]: h["count"] for h in hourly}
+    """, (org_id,))
 
     # 2) Message count by day of week (0=Sunday, 6=Saturday)
-    daily = conn.execute("""
+    daily_f = _analytics_pool.submit(_analytics_rows, """
         SELECT CAST(strftime('%%w', m.created_at) AS INTEGER) AS dow, COUNT(*) AS count
         FROM messages m
         JOIN conversations c ON m.conversation_id = c.id
         WHERE m.org_id = ? AND m.sender_type = 'contact'
         GROUP BY dow ORDER BY dow
-    """, (org_id,)).fetchall()
-    day_names = ["อาทิตย์", "จันทร์", "อังคาร", "พุธ", "พฤหัสบดี", "ศุกร์", "เสาร์"]
-    daily_data = [{"day": day_names[d["dow"]], "dow": d["dow"], "count": d["count"]} for d in daily]
-
-    # 3) Top active contacts (message count, last seen, first seen)
-    top_contacts = conn.execute("""
+    """, (org_id,))
+
+    # 3) Top active contacts (message count, last seen, first seen).
+    # Messages are aggregated per conversation first, off the covering
+    # index, so the final join and sort only see one row per conversation
+    # instead of the full contacts×messages working set.
+    top_contacts_f = _analytics_pool.submit(_analytics_rows, """
+        WITH msg_counts AS (
+            SELECT conversation_id, COUNT(*) AS cnt, MAX(created_at) AS last_at
+            FROM messages
+            WHERE org_id = ? AND sender_type = 'contact'
+            GROUP BY conversation_id
+        )
         SELECT ct.id, ct.display_name, ct.platform_user_id, ct.first_seen_at, ct.last_seen_at,
                ct.customer_code, ct.tags_json, ct.notes,
-               COUNT(m.id) AS message_count,
-               MAX(m.created_at) AS last_message_at
+               SUM(mc.cnt) AS message_count,
+               MAX(mc.last_at) AS last_message_at
         FROM contacts ct
         JOIN conversations cv ON cv.contact_id = ct.id
-        JOIN messages m ON m.conversation_id = cv.id AND m.sender_type = 'contact'
+        JOIN msg_counts mc ON mc.conversation_id = cv.id
         WHERE ct.org_id = ?
         GROUP BY ct.id
         ORDER BY message_count DESC
         LIMIT 20
-    """, (org_id,)).fetchall()
-    top_contacts_data = [dict(c) for c in top_contacts]
-
-    # 4) Product category keywords — scan recent messages for common product-related keywords
-    keyword_categories = {
-        "อิเล็กทรอนิกส์": ["โทรศัพท์", "มือถือ", "คอม", "โน๊ตบุ๊ค", "laptop", "phone", "tablet", "ipad", "iphone", "กล้อง", "camera", "หูฟัง"],
-        "แฟชั่น/เสื้อผ้า": ["เสื้อ", "กางเกง", "รองเท้า", "กระเป๋า", "เครื่องประดับ", "นาฬิกา", "แว่น", "shoes", "bag", "watch", "clothes"],
-        "อาหาร/เครื่องดื่ม": ["อาหาร", "ขนม", "เครื่องดื่ม", "กาแฟ", "ชา", "food", "snack", "coffee", "supplement", "วิตามิน"],
-        "สุขภาพ/ความงาม": ["ครีม", "เซรั่ม", "สกินแคร์", "skincare", "อาหารเสริม", "ยา", "cosmetic", "เครื่องสำอาง", "beauty"],
-        "ของใช้ในบ้าน": ["เฟอร์นิเจอร์", "furniture", "โซฟา", "เตียง", "ตู้", "โต๊ะ", "ของตกแต่ง", "home"],
-        "ชิ้นส่วน/อะไหล่": ["อะไหล่", "parts", "spare", "ชิ้นส่วน", "เครื่องจักร", "machine"],
-    }
+    """, (org_id, org_id))
 
-    recent_messages = conn.execute("""
-        SELECT m.content FROM messages m
-        WHERE m.org_id = ? AND m.sender_type = 'contact' AND m.message_type = 'text'
-        ORDER BY m.created_at DESC LIMIT 500
-    """, (org_id,)).fetchall()
-
-    category_counts = {}
-    for cat, keywords in keyword_categories.items():
-        count = 0
-        for msg_row in recent_messages:
-            text = (msg_row["content"] or "").lower()
-            if any(kw.lower() in text for kw in keywords):
-                count += 1
-        if count > 0:
-            category_counts[cat] = count
+    # 4) Product category keywords — counted in SQL; only six
+    # (category, count) pairs cross the DB boundary
+    categories_f = _analytics_pool.submit(
+        _analytics_rows, _CATEGORY_COUNT_SQL, (org_id,) + _CATEGORY_COUNT_PARAMS)
 
     # 5) Monthly message trend
-    monthly = conn.execute("""
+    monthly_f = _analytics_pool.submit(_analytics_rows, """
         SELECT strftime('%%Y-%%m', m.created_at) AS month, COUNT(*) AS count
         FROM messages m
         WHERE m.org_id = ? AND m.sender_type = 'contact'
         GROUP BY month ORDER BY month DESC LIMIT 12
-    """, (org_id,)).fetchall()
-    monthly_data = [{"month": m["month"], "count": m["count"]} for m in monthly]
+    """, (org_id,))
+
+    # 6) Average response time (admin reply after contact message).
+    # LAG over each conversation's timeline finds contact→admin/ai
+    # transitions in a single ordered pass, instead of the correlated
+    # MIN(id) subquery SQLite would re-run per contact message.
+    avg_resp_f = _analytics_pool.submit(_analytics_rows, """
+        WITH ordered AS (
+            SELECT sender_type, created_at,
+                LAG(sender_type) OVER w AS prev_type,
+                LAG(created_at) OVER w AS prev_at
+            FROM messages
+            WHERE org_id = ?
+            WINDOW w AS (PARTITION BY conversation_id ORDER BY created_at, id)
+        )
+        SELECT AVG((julianday(created_at) - julianday(prev_at)) * 86400) AS avg_seconds
+        FROM ordered
+        WHERE prev_type = 'contact' AND sender_type IN ('admin', 'ai')
+    """, (org_id,))
+
+    hourly_data = {h["hour"]: h["count"] for h in hourly_f.result()}
+
+    daily_data = [{"day": _DAY_NAMES[d["dow"]], "dow": d["dow"], "count": d["count"]} for d in daily_f.result()]
+
+    top_contacts_data = _rows_to_list(top_contacts_f.result())
+
+    category_counts = {
+        row["category"]: row["hits"] for row in categories_f.result() if row["hits"] > 0
+    }
+
+    monthly_data = [{"month": m["month"], "count": m["count"]} for m in monthly_f.result()]
     monthly_data.reverse()
 
-    # 6) Average response time (admin reply after contact message)
-    avg_resp = conn.execute("""
-        SELECT AVG(
-            CAST((julianday(admin_msg.created_at) - julianday(contact_msg.created_at)) * 86400 AS REAL)
-        ) AS avg_seconds
-        FROM messages contact_msg
-        JOIN messages admin_msg ON admin_msg.conversation_id = contact_msg.conversation_id
-            AND admin_msg.sender_type IN ('admin', 'ai')
-            AND admin_msg.created_at > contact_msg.created_at
-            AND admin_msg.id = (
-                SELECT MIN(am2.id) FROM messages am2
-                WHERE am2.conversation_id = contact_msg.conversation_id
-                AND am2.sender_type IN ('admin', 'ai')
-                AND am2.created_at > contact_msg.created_at
-            )
-        WHERE contact_msg.org_id = ? AND contact_msg.sender_type = 'contact'
-    """, (org_id,)).fetchone()
+    avg_resp = avg_resp_f.result()[0]
     avg_response_seconds = avg_resp["avg_seconds"] if avg_resp and avg_resp["avg_seconds"] else 0
 
-    conn.close()
-
     return jsonify({
-        "hourly_activity": {str(h): hourly_data.get(h, 0) for h in range(24)},
+        # int keys serialize as JSON strings either way (orjson is given
+        # OPT_NON_STR_KEYS by the app's JSON provider) — no str() casts
+        "hourly_activity": {h: hourly_data.get(h, 0) for h in range(24)},
         "daily_activity": daily_data,
         "top_contacts": top_contacts_data,
         "product_categories": category_counts,
@@ -1149,11 +1303,14 @@ def api_restore_backup():
         return jsonify({"error": f"Failed to create safety backup: {e}"}), 500
 
     if "file" in request.files:
-        # Restore from uploaded file
+        # Restore from uploaded file, streamed to disk in fixed 64KB
+        # chunks so a large database upload never sits in memory whole
+        import shutil
         file = request.files["file"]
         temp_path = os.path.join(BACKUP_DIR, f"restore_upload_{uuid.uuid4().hex}.db")
         os.makedirs(BACKUP_DIR, exist_ok=True)
-        file.save(temp_path)
+        with open(temp_path, "wb") as dst:
+            shutil.copyfileobj(file.stream, dst, length=1 << 16)
         success, msg = restore_from_backup(temp_path)
         try:
             os.remove(temp_path)
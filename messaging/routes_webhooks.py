@@ -3,7 +3,9 @@ Webhook endpoints for receiving messages from LINE, Facebook, and Instagram.
 """
 
 import json
-import threading
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from flask import request, jsonify, current_app
 from messaging import messaging_bp
 from messaging_db import get_channel, get_messages_for_conversation, add_message, get_default_ai_provider, get_org_by_id
@@ -13,6 +15,14 @@ from messaging.services.ai_service import generate_suggestion
 from messaging.platforms.line_adapter import LineAdapter
 from messaging.platforms.facebook_adapter import FacebookAdapter
 from messaging.platforms.instagram_adapter import InstagramAdapter
+from messaging.platforms._pool import fetch_profiles
+
+
+@lru_cache(maxsize=256)
+def _ai_enabled_from_settings(settings_json):
+    """Parse the auto-reply flag out of a settings blob, memoized on the
+    raw JSON text so the flag self-invalidates whenever settings change."""
+    return json.loads(settings_json or "{}").get("ai_auto_reply_enabled", True)  # Default: enabled
 
 
 def _is_ai_auto_reply_enabled(org_id):
@@ -20,13 +30,12 @@ def _is_ai_auto_reply_enabled(org_id):
     org = get_org_by_id(org_id)
     if not org:
         return False
-    settings = json.loads(dict(org).get("settings_json") or "{}")
-    return settings.get("ai_auto_reply_enabled", True)  # Default: enabled
+    return _ai_enabled_from_settings(org["settings_json"])
 
 
 def _auto_save_public_url(org_id):
     """Auto-detect and save the public base URL from incoming webhook request headers."""
-    from messaging_db import update_org
+    from messaging_db import update_org_setting
     try:
         # Cloudflare Tunnel / reverse proxy sets these headers
         proto = request.headers.get("X-Forwarded-Proto", "https")
@@ -34,13 +43,15 @@ def _auto_save_public_url(org_id):
         if not host or "localhost" in host or "127.0.0.1" in host:
             return
         public_url = f"{proto}://{host}"
+        # The compare reads through the cached org row, so steady state
+        # costs no query; the write sets just this key atomically and
+        # can't clobber concurrent edits to other settings
         org = get_org_by_id(org_id)
         if not org:
             return
-        settings = json.loads(dict(org).get("settings_json") or "{}")
+        settings = json.loads(org["settings_json"] or "{}")
         if settings.get("public_base_url") != public_url:
-            settings["public_base_url"] = public_url
-            update_org(org_id, settings_json=json.dumps(settings))
+            update_org_setting(org_id, "public_base_url", public_url)
             print(f"[Auto-detect] Saved public URL: {public_url}")
     except Exception as e:
         print(f"[Auto-detect URL] Error: {e}")
@@ -57,6 +68,97 @@ def _get_socketio():
     return current_app.extensions.get("socketio")
 
 
+# AI replies run off the webhook request on a fixed pool of reused
+# workers; a message burst queues here instead of spawning one fresh
+# thread per event with no cap on count or memory.
+_AI_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ai-reply")
+
+
+# DB work for inbound webhook batches fans out on this pool so a batch
+# of N messages costs roughly one round-trip, not N serial ones.
+_WEBHOOK_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("WEBHOOK_CONCURRENCY", "8")),
+    thread_name_prefix="webhook",
+)
+
+
+def _process_batch(channel_id, messages):
+    """Run handle_incoming_message over a webhook batch.
+
+    Returns [(msg, result), ...] in batch order. Messages are grouped by
+    sender: groups run concurrently on _WEBHOOK_POOL while each sender's
+    own messages stay sequential, so per-sender ordering holds and the
+    contact/conversation find-or-create never races against itself.
+    Socket emits stay on the request thread.
+    """
+    def _handle(msg):
+        return handle_incoming_message(
+            channel_id=channel_id,
+            platform_user_id=msg.platform_user_id,
+            content=msg.content,
+            message_type=msg.message_type,
+            display_name=msg.display_name,
+            avatar_url=msg.avatar_url,
+            metadata=msg.metadata,
+            platform_message_id=msg.platform_message_id,
+        )
+
+    if len(messages) <= 1:
+        return [(msg, _handle(msg)) for msg in messages]
+
+    groups = {}
+    for msg in messages:
+        groups.setdefault(msg.platform_user_id, []).append(msg)
+
+    results = {}
+
+    def _run_group(group):
+        for msg in group:
+            results[id(msg)] = _handle(msg)
+
+    for fut in [_WEBHOOK_POOL.submit(_run_group, g) for g in groups.values()]:
+        fut.result()
+    return [(msg, results.get(id(msg))) for msg in messages]
+
+
+# Hands verified Meta batches to the background so the webhook can
+# return 200 immediately — Meta retries slow handlers. Separate from
+# _WEBHOOK_POOL on purpose: a deferred batch waits on that pool, so
+# running both stages on one executor could deadlock under load.
+_WEBHOOK_DISPATCH = ThreadPoolExecutor(max_workers=4, thread_name_prefix="webhook-dispatch")
+
+
+def _deliver_batch(app, channel_id, channel_type, org_id, messages, exclude_user_id=""):
+    """Store a verified webhook batch and emit UI events, after the 200
+    has already gone back to the platform.
+
+    exclude_user_id drops the page/account's own echoes. Filtering here
+    keeps it off the ack path, and the usual no-echo batch is iterated
+    once without building a second list.
+    """
+    with app.app_context():
+        try:
+            if exclude_user_id and any(m.platform_user_id == exclude_user_id for m in messages):
+                messages = [m for m in messages if m.platform_user_id != exclude_user_id]
+                if not messages:
+                    return
+            socketio = app.extensions.get("socketio")
+            org_room = f"org_{org_id}"
+            for msg, result in _process_batch(channel_id, messages):
+                if result and socketio:
+                    conversation_id, message_id, contact_id = result
+                    socketio.emit("new_message", {
+                        "conversation_id": conversation_id,
+                        "message_id": message_id,
+                        "contact_id": contact_id,
+                        "channel_type": channel_type,
+                        "content": msg.content,
+                        "display_name": msg.display_name,
+                    }, room=org_room)
+        except Exception as e:
+            print(f"[Webhook] Background processing error: {e}")
+
+
 def _auto_reply_with_ai(app, channel_id, conversation_id, org_id, platform_user_id):
     """Generate AI reply and send it back to the customer (runs in background thread)."""
     with app.app_context():
@@ -134,11 +236,13 @@ def _auto_reply_with_ai(app, channel_id, conversation_id, org_id, platform_user_
 
 @messaging_bp.route("/webhooks/line/<int:channel_id>", methods=["POST"])
 def webhook_line(channel_id):
+    # Credentials first: on a cold cache this runs one JOIN that also
+    # warms the channel row, so get_channel below never hits the DB
+    creds = load_credentials(channel_id)
     channel = get_channel(channel_id)
     if not channel or channel["channel_type"] != "line" or not channel["is_active"]:
         return jsonify({"error": "Invalid channel"}), 404
 
-    creds = load_credentials(channel_id)
     if not creds:
         return jsonify({"error": "No credentials"}), 500
 
@@ -156,45 +260,56 @@ def webhook_line(channel_id):
 
     socketio = _get_socketio()
 
+    # Constant across the batch — compute once, not per message
+    org_id = channel["org_id"]
+    org_room = f"org_{org_id}"
+    ai_enabled = _is_ai_auto_reply_enabled(org_id)
+
+    # Prefetch profiles for unique senders in parallel instead of one
+    # sequential API call per message
+    missing_profiles = {m.platform_user_id for m in messages if not m.display_name}
+    profiles = fetch_profiles(adapter, missing_profiles) if missing_profiles else {}
+
     for msg in messages:
-        # Get user profile if display_name is empty
-        if not msg["display_name"]:
-            profile = adapter.get_user_profile(msg["platform_user_id"])
-            msg["display_name"] = profile.get("display_name", "")
-            msg["avatar_url"] = profile.get("avatar_url", "")
+        if not msg.display_name:
+            profile = profiles.get(msg.platform_user_id, {})
+            msg.display_name = profile.get("display_name", "")
+            msg.avatar_url = profile.get("avatar_url", "")
 
         result = handle_incoming_message(
             channel_id=channel_id,
-            platform_user_id=msg["platform_user_id"],
-            content=msg["content"],
-            message_type=msg["message_type"],
-            display_name=msg["display_name"],
-            avatar_url=msg["avatar_url"],
-            metadata=msg["metadata"],
-            platform_message_id=msg["platform_message_id"],
+            platform_user_id=msg.platform_user_id,
+            content=msg.content,
+            message_type=msg.message_type,
+            display_name=msg.display_name,
+            avatar_url=msg.avatar_url,
+            metadata=msg.metadata,
+            platform_message_id=msg.platform_message_id,
         )
 
         if result:
             conversation_id, message_id, contact_id = result
 
             if socketio:
-                socketio.emit("new_message", {
+                # Fire-and-forget: on a message-queue adapter emit pays a
+                # broker round-trip, which shouldn't sit on the path to
+                # the 200 LINE is waiting for
+                socketio.start_background_task(socketio.emit, "new_message", {
                     "conversation_id": conversation_id,
                     "message_id": message_id,
                     "contact_id": contact_id,
                     "channel_type": "line",
-                    "content": msg["content"],
-                    "display_name": msg["display_name"],
-                }, room=f"org_{channel['org_id']}")
+                    "content": msg.content,
+                    "display_name": msg.display_name,
+                }, room=org_room)
 
             # AI Auto-Reply (only if enabled in org settings)
-            if _is_ai_auto_reply_enabled(channel["org_id"]):
+            if ai_enabled:
                 app = current_app._get_current_object()
-                thread = threading.Thread(
-                    target=_auto_reply_with_ai,
-                    args=(app, channel_id, conversation_id, channel["org_id"], msg["platform_user_id"]),
+                _AI_POOL.submit(
+                    _auto_reply_with_ai,
+                    app, channel_id, conversation_id, org_id, msg.platform_user_id,
                 )
-                thread.start()
 
     return jsonify({"status": "ok"}), 200
 
@@ -223,11 +338,13 @@ def webhook_facebook_verify(channel_id):
 
 @messaging_bp.route("/webhooks/facebook/<int:channel_id>", methods=["POST"])
 def webhook_facebook(channel_id):
+    # Credentials first: on a cold cache this runs one JOIN that also
+    # warms the channel row, so get_channel below never hits the DB
+    creds = load_credentials(channel_id)
     channel = get_channel(channel_id)
     if not channel or channel["channel_type"] != "facebook" or not channel["is_active"]:
         return jsonify({"error": "Invalid channel"}), 404
 
-    creds = load_credentials(channel_id)
     if not creds:
         return jsonify({"error": "No credentials"}), 500
 
@@ -237,35 +354,16 @@ def webhook_facebook(channel_id):
         return jsonify({"error": "Invalid signature"}), 403
 
     messages = adapter.parse_webhook(request)
-    socketio = _get_socketio()
 
-    # Filter out messages from the page itself
-    page_id = creds.get("page_id", "")
-    messages = [m for m in messages if m["platform_user_id"] != page_id]
-
-    for msg in messages:
-        result = handle_incoming_message(
-            channel_id=channel_id,
-            platform_user_id=msg["platform_user_id"],
-            content=msg["content"],
-            message_type=msg["message_type"],
-            display_name=msg["display_name"],
-            avatar_url=msg["avatar_url"],
-            metadata=msg["metadata"],
-            platform_message_id=msg["platform_message_id"],
+    # Ack immediately; storage, the page-echo filter and UI events all
+    # happen in the background
+    if messages:
+        _WEBHOOK_DISPATCH.submit(
+            _deliver_batch, current_app._get_current_object(),
+            channel_id, "facebook", channel["org_id"], messages,
+            exclude_user_id=creds.get("page_id", ""),
         )
 
-        if result and socketio:
-            conversation_id, message_id, contact_id = result
-            socketio.emit("new_message", {
-                "conversation_id": conversation_id,
-                "message_id": message_id,
-                "contact_id": contact_id,
-                "channel_type": "facebook",
-                "content": msg["content"],
-                "display_name": msg["display_name"],
-            }, room=f"org_{channel['org_id']}")
-
     return jsonify({"status": "ok"}), 200
 
 
@@ -293,11 +391,13 @@ def webhook_instagram_verify(channel_id):
 
 @messaging_bp.route("/webhooks/instagram/<int:channel_id>", methods=["POST"])
 def webhook_instagram(channel_id):
+    # Credentials first: on a cold cache this runs one JOIN that also
+    # warms the channel row, so get_channel below never hits the DB
+    creds = load_credentials(channel_id)
     channel = get_channel(channel_id)
     if not channel or channel["channel_type"] != "instagram" or not channel["is_active"]:
         return jsonify({"error": "Invalid channel"}), 404
 
-    creds = load_credentials(channel_id)
     if not creds:
         return jsonify({"error": "No credentials"}), 500
 
@@ -307,32 +407,14 @@ def webhook_instagram(channel_id):
         return jsonify({"error": "Invalid signature"}), 403
 
     messages = adapter.parse_webhook(request)
-    socketio = _get_socketio()
 
-    ig_id = creds.get("instagram_account_id", "")
-    messages = [m for m in messages if m["platform_user_id"] != ig_id]
-
-    for msg in messages:
-        result = handle_incoming_message(
-            channel_id=channel_id,
-            platform_user_id=msg["platform_user_id"],
-            content=msg["content"],
-            message_type=msg["message_type"],
-            display_name=msg["display_name"],
-            avatar_url=msg["avatar_url"],
-            metadata=msg["metadata"],
-            platform_message_id=msg["platform_message_id"],
+    # Ack immediately; storage, the own-account filter and UI events all
+    # happen in the background
+    if messages:
+        _WEBHOOK_DISPATCH.submit(
+            _deliver_batch, current_app._get_current_object(),
+            channel_id, "instagram", channel["org_id"], messages,
+            exclude_user_id=creds.get("instagram_account_id", ""),
         )
 
-        if result and socketio:
-            conversation_id, message_id, contact_id = result
-            socketio.emit("new_message", {
-                "conversation_id": conversation_id,
-                "message_id": message_id,
-                "contact_id": contact_id,
-                "channel_type": "instagram",
-                "content": msg["content"],
-                "display_name": msg["display_name"],
-            }, room=f"org_{channel['org_id']}")
-
     return jsonify({"status": "ok"}), 200
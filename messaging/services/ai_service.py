@@ -3,7 +3,12 @@ AI service - abstraction over multiple AI providers for response suggestions.
 """
 
 import json
+import os
+import threading
+from functools import lru_cache
+
 import requests
+from messaging.utils.http import SESSION
 from messaging.utils.encryption import decrypt_json
 from messaging_db import get_ai_provider, get_default_ai_provider
 
@@ -26,12 +31,32 @@ AI_PROVIDERS = {
     },
 }
 
+# Cap in-flight completion calls per provider so an auto-reply burst
+# can't pile every pool thread onto one upstream (Anthropic documents a
+# 5-concurrent ceiling for small keys; the others get the same default).
+# Waiting threads queue on the semaphore instead of tripping 429s.
+_LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "5"))
+_provider_limits = {
+    name: threading.BoundedSemaphore(_LLM_MAX_CONCURRENCY) for name in ("openai", "anthropic", "google_gemini")
+}
+
 DEFAULT_SYSTEM_PROMPT = """You are a helpful customer service assistant.
 Respond to the customer's message in a professional and friendly manner.
 If the conversation is in Thai, reply in Thai. If in English, reply in English.
 Keep responses concise and helpful."""
 
 
+@lru_cache(maxsize=256)
+def get_provider_api_key(encrypted_api_key):
+    """Decrypt a provider API key, cached on the ciphertext.
+
+    Fernet decryption is CPU-bound and keys change rarely; keying the
+    cache on the ciphertext itself means a rotation produces a new entry
+    and the stale plaintext simply ages out of the LRU.
+    """
+    return decrypt_json(encrypted_api_key).get("api_key", "")
+
+
 def generate_suggestion(org_id, conversation_messages, custom_system_prompt=None, provider_id=None):
     """Generate an AI response suggestion based on conversation context.
 
@@ -45,7 +70,7 @@ def generate_suggestion(org_id, conversation_messages, custom_system_prompt=None
     if not provider:
         return False, "No AI provider configured. Go to Settings > AI to add one."
 
-    api_key = decrypt_json(provider["encrypted_api_key"]).get("api_key", "")
+    api_key = get_provider_api_key(provider["encrypted_api_key"])
     if not api_key:
         return False, "AI provider API key is invalid."
 
@@ -76,7 +101,7 @@ def test_api_key(provider_type, api_key) -> tuple[bool, str]:
     """Test if an API key is valid."""
     try:
         if provider_type == "openai":
-            resp = requests.get(
+            resp = SESSION.get(
                 "https://api.openai.com/v1/models",
                 headers={"Authorization": f"Bearer {api_key}"},
                 timeout=10,
@@ -84,7 +109,7 @@ def test_api_key(provider_type, api_key) -> tuple[bool, str]:
             return resp.status_code == 200, "Valid" if resp.status_code == 200 else f"Error: {resp.status_code}"
 
         elif provider_type == "anthropic":
-            resp = requests.post(
+            resp = SESSION.post(
                 "https://api.anthropic.com/v1/messages",
                 headers={
                     "x-api-key": api_key,
@@ -101,7 +126,7 @@ def test_api_key(provider_type, api_key) -> tuple[bool, str]:
             return resp.status_code == 200, "Valid" if resp.status_code == 200 else f"Error: {resp.status_code}"
 
         elif provider_type == "google_gemini":
-            resp = requests.get(
+            resp = SESSION.get(
                 f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}",
                 timeout=10,
             )
@@ -114,15 +139,32 @@ def test_api_key(provider_type, api_key) -> tuple[bool, str]:
 
 def _build_context_messages(conversation_messages, system_prompt):
     """Convert DB messages to chat format."""
-    chat_messages = []
-    for msg in conversation_messages[-15:]:  # Last 15 messages for context
-        role = "assistant" if msg["sender_type"] in ("admin", "ai") else "user"
-        chat_messages.append({"role": role, "content": msg["content"]})
-    return chat_messages
+    # Regenerating a suggestion replays the same unchanged tail of the
+    # conversation; key the build on the message rows themselves (ids
+    # are globally unique, content is immutable once stored) so repeats
+    # reuse the prior result instead of rebuilding 15 dicts.
+    key = tuple(
+        (msg["id"], msg["sender_type"], msg["content"])
+        for msg in conversation_messages[-15:]  # Last 15 messages for context
+    )
+    return list(_cached_context(key))
+
+
+@lru_cache(maxsize=512)
+def _cached_context(key):
+    return tuple(
+        {"role": "assistant" if sender_type in ("admin", "ai") else "user", "content": content}
+        for _id, sender_type, content in key
+    )
 
 
 def _call_openai(api_key, model, messages, system_prompt, max_tokens, temperature):
-    resp = requests.post(
+    with _provider_limits["openai"]:
+        return _request_openai(api_key, model, messages, system_prompt, max_tokens, temperature)
+
+
+def _request_openai(api_key, model, messages, system_prompt, max_tokens, temperature):
+    resp = SESSION.post(
         "https://api.openai.com/v1/chat/completions",
         headers={
             "Authorization": f"Bearer {api_key}",
@@ -143,7 +185,12 @@ def _call_openai(api_key, model, messages, system_prompt, max_tokens, temperatur
 
 
 def _call_anthropic(api_key, model, messages, system_prompt, max_tokens, temperature):
-    resp = requests.post(
+    with _provider_limits["anthropic"]:
+        return _request_anthropic(api_key, model, messages, system_prompt, max_tokens, temperature)
+
+
+def _request_anthropic(api_key, model, messages, system_prompt, max_tokens, temperature):
+    resp = SESSION.post(
         "https://api.anthropic.com/v1/messages",
         headers={
             "x-api-key": api_key,
@@ -166,13 +213,18 @@ def _call_anthropic(api_key, model, messages, system_prompt, max_tokens, tempera
 
 
 def _call_gemini(api_key, model, messages, system_prompt, max_tokens, temperature):
+    with _provider_limits["google_gemini"]:
+        return _request_gemini(api_key, model, messages, system_prompt, max_tokens, temperature)
+
+
+def _request_gemini(api_key, model, messages, system_prompt, max_tokens, temperature):
     # Convert to Gemini format
     contents = []
     for msg in messages:
         role = "user" if msg["role"] == "user" else "model"
         contents.append({"role": role, "parts": [{"text": msg["content"]}]})
 
-    resp = requests.post(
+    resp = SESSION.post(
         f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}",
         headers={"Content-Type": "application/json"},
         json={
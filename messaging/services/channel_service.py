@@ -2,12 +2,18 @@
 Channel management service - handles CRUD and credential verification.
 """
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import requests
+from messaging.utils.http import SESSION
 from messaging.utils.encryption import encrypt_json, decrypt_json, mask_secret
 from messaging_db import (
     create_channel, get_channel, get_channels_for_org, update_channel,
     delete_channel, set_channel_credentials, get_channel_credentials,
-    update_channel_verified,
+    get_channel_with_credentials, update_channel_verified,
 )
 
 CHANNEL_TYPES = {
@@ -38,23 +44,51 @@ CHANNEL_TYPES = {
 }
 
 
+# Every webhook event and every outbound send loads credentials, which
+# costs a DB read plus a Fernet decrypt. Credentials change only through
+# save_credentials, so a short TTL plus explicit invalidation there keeps
+# this fresh; the TTL also bounds staleness if the DB is edited directly.
+_CREDS_CACHE_TTL = 600
+_creds_cache = {}
+_creds_cache_lock = threading.Lock()
+
+
 def save_credentials(channel_id, channel_type, credentials: dict):
     """Encrypt and store channel credentials."""
     encrypted = encrypt_json(credentials)
     credential_type = f"{channel_type}_api"
     set_channel_credentials(channel_id, encrypted, credential_type)
+    with _creds_cache_lock:
+        _creds_cache.pop(channel_id, None)
 
 
 def load_credentials(channel_id) -> dict | None:
     """Load and decrypt channel credentials."""
-    cred = get_channel_credentials(channel_id)
-    if not cred:
+    now = time.time()
+    with _creds_cache_lock:
+        cached = _creds_cache.get(channel_id)
+        if cached and now - cached[0] < _CREDS_CACHE_TTL:
+            return cached[1]
+
+    # One JOIN covers channel row and credentials; the channel row lands
+    # in messaging_db's channel cache as a side effect, so a cold webhook
+    # pays a single round-trip for both lookups
+    channel, encrypted = get_channel_with_credentials(channel_id)
+    if channel is None or encrypted is None:
         return None
-    return decrypt_json(cred["encrypted_credentials"])
+    creds = decrypt_json(encrypted)
+    with _creds_cache_lock:
+        _creds_cache[channel_id] = (now, creds)
+    return creds
 
 
-def get_masked_credentials(channel_id) -> dict | None:
-    """Get credentials with values masked for display."""
+@lru_cache(maxsize=1024)
+def _masked_credentials(channel_id, updated_at):
+    """Decrypt-and-mask, cached per (channel, credential revision).
+
+    updated_at is bumped by set_channel_credentials on every rotation,
+    so stale entries simply stop being keyed and age out of the LRU.
+    """
     creds = load_credentials(channel_id)
     if not creds:
         return None
@@ -67,6 +101,15 @@ def get_masked_credentials(channel_id) -> dict | None:
     return masked
 
 
+def get_masked_credentials(channel_id) -> dict | None:
+    """Get credentials with values masked for display."""
+    cred = get_channel_credentials(channel_id)
+    if not cred:
+        return None
+    masked = _masked_credentials(channel_id, cred["updated_at"])
+    return dict(masked) if masked else None
+
+
 def verify_channel_connection(channel_id) -> tuple[bool, str]:
     """Test if channel credentials are valid by making a lightweight API call."""
     channel = get_channel(channel_id)
@@ -90,9 +133,25 @@ def verify_channel_connection(channel_id) -> tuple[bool, str]:
         return False, f"Connection error: {str(e)}"
 
 
+# Health checks are independent ~200ms API calls; run multi-channel
+# verification on a small pool so a dashboard of N channels takes about
+# one call's latency instead of N.
+_verify_pool = ThreadPoolExecutor(max_workers=10, thread_name_prefix="verify")
+
+
+def verify_channels_connection(channel_ids):
+    """Verify many channels concurrently.
+
+    Returns {channel_id: (ok, message)} with the same per-channel results
+    verify_channel_connection would give serially.
+    """
+    futures = {cid: _verify_pool.submit(verify_channel_connection, cid) for cid in channel_ids}
+    return {cid: fut.result() for cid, fut in futures.items()}
+
+
 def _verify_line(channel_id, creds):
     token = creds.get("channel_access_token", "")
-    resp = requests.get(
+    resp = SESSION.get(
         "https://api.line.me/v2/bot/info",
         headers={"Authorization": f"Bearer {token}"},
         timeout=10,
@@ -107,7 +166,7 @@ def _verify_line(channel_id, creds):
 def _verify_facebook(creds):
     token = creds.get("page_access_token", "")
     page_id = creds.get("page_id", "me")
-    resp = requests.get(
+    resp = SESSION.get(
         f"https://graph.facebook.com/v18.0/{page_id}",
         params={"access_token": token, "fields": "name,id"},
         timeout=10,
@@ -121,7 +180,7 @@ def _verify_facebook(creds):
 def _verify_instagram(creds):
     token = creds.get("access_token", "")
     ig_id = creds.get("instagram_account_id", "me")
-    resp = requests.get(
+    resp = SESSION.get(
         f"https://graph.facebook.com/v18.0/{ig_id}",
         params={"access_token": token, "fields": "name,username"},
         timeout=10,
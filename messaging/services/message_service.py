@@ -2,57 +2,109 @@
 Core messaging service - handles sending/receiving messages across platforms.
 """
 
-import json
+import importlib
+import threading
+import time
+
+import orjson
 from messaging_db import (
     find_or_create_contact, find_or_create_conversation,
     add_message, get_channel, get_conversation,
-    update_conversation, mark_messages_read,
+    update_conversation,
 )
 from messaging.services.channel_service import load_credentials
-from messaging.platforms.line_adapter import LineAdapter
-from messaging.platforms.facebook_adapter import FacebookAdapter
-from messaging.platforms.instagram_adapter import InstagramAdapter
 
 
-PLATFORM_ADAPTERS = {
-    "line": LineAdapter,
-    "facebook": FacebookAdapter,
-    "instagram": InstagramAdapter,
+# Adapter classes resolve on first use rather than at import. The web app
+# pulls them in through the route modules anyway, but anything importing
+# the service layer directly (scripts, a future worker process) skips the
+# requests/crypto import cost for platforms it never touches.
+_ADAPTER_PATHS = {
+    "line": ("messaging.platforms.line_adapter", "LineAdapter"),
+    "facebook": ("messaging.platforms.facebook_adapter", "FacebookAdapter"),
+    "instagram": ("messaging.platforms.instagram_adapter", "InstagramAdapter"),
 }
+_adapter_classes = {}
+
+
+def _get_adapter_class(channel_type):
+    """Return the adapter class for a channel type, or None if unknown."""
+    cls = _adapter_classes.get(channel_type)
+    if cls is None and channel_type in _ADAPTER_PATHS:
+        module_name, class_name = _ADAPTER_PATHS[channel_type]
+        cls = getattr(importlib.import_module(module_name), class_name)
+        _adapter_classes[channel_type] = cls
+    return cls
+
+# Most messages carry no metadata — skip serialization entirely for them
+_EMPTY_JSON = "{}"
+
+# Platforms retry webhooks on any non-2xx, so the same platform_message_id
+# can arrive again seconds later. add_message already deduplicates in the
+# DB; this map short-circuits retries before the contact/conversation
+# lookups even run. Entries expire after an hour — far longer than any
+# retry window.
+_SEEN_TTL = 3600
+_seen_ids = {}
+_seen_lock = threading.Lock()
+
+
+def _already_seen(platform_message_id, now):
+    """Record a message id, reporting whether it was seen within the TTL."""
+    with _seen_lock:
+        ts = _seen_ids.get(platform_message_id)
+        if ts and now - ts < _SEEN_TTL:
+            return True
+        if len(_seen_ids) > 100_000:
+            for mid in [m for m, t in _seen_ids.items() if now - t >= _SEEN_TTL]:
+                del _seen_ids[mid]
+        _seen_ids[platform_message_id] = now
+        return False
 
 
 def handle_incoming_message(channel_id, platform_user_id, content, message_type="text",
                              display_name="", avatar_url="", metadata=None, platform_message_id=""):
     """Process an incoming message from any platform.
 
-    Returns (conversation_id, message_id, contact_id) or None on error.
+    Returns (conversation_id, message_id, contact_id) or None on error
+    or duplicate delivery.
     """
-    channel = get_channel(channel_id)
-    if not channel or not channel["is_active"]:
+    if platform_message_id and _already_seen(platform_message_id, time.time()):
         return None
 
-    org_id = channel["org_id"]
-
-    # Find or create contact
-    contact_id = find_or_create_contact(
-        org_id, channel_id, platform_user_id,
-        display_name=display_name, avatar_url=avatar_url,
-    )
-
-    # Find or create conversation
-    conversation_id = find_or_create_conversation(org_id, channel_id, contact_id)
-
-    # Store message
-    message_id = add_message(
-        conversation_id=conversation_id,
-        org_id=org_id,
-        sender_type="contact",
-        sender_id=platform_user_id,
-        content=content,
-        message_type=message_type,
-        metadata_json=json.dumps(metadata or {}),
-        platform_message_id=platform_message_id,
-    )
+    try:
+        channel = get_channel(channel_id)
+        if not channel or not channel["is_active"]:
+            return None
+
+        org_id = channel["org_id"]
+
+        # Find or create contact
+        contact_id = find_or_create_contact(
+            org_id, channel_id, platform_user_id,
+            display_name=display_name, avatar_url=avatar_url,
+        )
+
+        # Find or create conversation
+        conversation_id = find_or_create_conversation(org_id, channel_id, contact_id)
+
+        # Store message
+        message_id = add_message(
+            conversation_id=conversation_id,
+            org_id=org_id,
+            sender_type="contact",
+            sender_id=platform_user_id,
+            content=content,
+            message_type=message_type,
+            metadata_json=orjson.dumps(metadata).decode() if metadata else _EMPTY_JSON,
+            platform_message_id=platform_message_id,
+        )
+    except Exception:
+        # Forget the id so the platform's retry isn't swallowed
+        if platform_message_id:
+            with _seen_lock:
+                _seen_ids.pop(platform_message_id, None)
+        raise
 
     return conversation_id, message_id, contact_id
 
@@ -75,7 +127,7 @@ def send_admin_reply(conversation_id, admin_id, content, message_type="text"):
         return False, "Channel credentials not configured"
 
     # Get platform adapter
-    adapter_class = PLATFORM_ADAPTERS.get(channel["channel_type"])
+    adapter_class = _get_adapter_class(channel["channel_type"])
     if not adapter_class:
         return False, f"Unsupported platform: {channel['channel_type']}"
 
@@ -1,9 +1,15 @@
 """
 Notification service - creates and pushes notifications to admins.
+
+Socket pushes here always target a room (org_<id> for broadcasts,
+admin_<id> for a single recipient): a room emit serializes the payload
+once and the server fans it out to every socket in the room. Do not
+expand these into per-admin/per-sid emit loops — that re-serializes the
+payload N times and N round-trips the message queue.
 """
 
 from messaging_db import (
-    create_notification, get_conversation, get_org_admins,
+    create_notification, create_notifications_bulk, get_conversation, get_org_admins,
 )
 
 
@@ -31,13 +37,11 @@ def notify_new_message(conversation_id, contact_name, message_preview, socketio=
                 "conversation_id": conversation_id,
             }, room=f"admin_{conv['assigned_admin_id']}")
     else:
-        # Notify all admins in org
-        admins = get_org_admins(org_id)
-        for admin in admins:
-            create_notification(
-                org_id, admin["id"], "new_message",
-                title, body, "conversation", conversation_id,
-            )
+        # Notify all admins in org — one INSERT for the lot, not one per admin
+        create_notifications_bulk([
+            (org_id, admin["id"], "new_message", title, body, "conversation", conversation_id)
+            for admin in get_org_admins(org_id)
+        ])
         if socketio:
             socketio.emit("notification", {
                 "type": "new_message",
@@ -3,7 +3,8 @@ SocketIO event handlers for real-time messaging.
 """
 
 from flask import session
-from messaging_db import get_admin_org_id, mark_messages_read
+from flask_socketio import join_room, leave_room
+from messaging_db import get_admin_org_id, mark_messages_read_async
 
 
 def register_socketio_events(socketio):
@@ -16,7 +17,6 @@ def register_socketio_events(socketio):
             return False  # Reject connection
         org_id = get_admin_org_id(admin_id)
         if org_id:
-            from flask_socketio import join_room
             join_room(f"org_{org_id}")
             join_room(f"admin_{admin_id}")
             socketio.emit("admin_online", {
@@ -36,23 +36,23 @@ def register_socketio_events(socketio):
 
     @socketio.on("join_conversation")
     def handle_join_conversation(data):
-        conversation_id = data.get("conversation_id")
-        if conversation_id:
-            from flask_socketio import join_room
+        # Accepts either a single conversation_id or a conversation_ids
+        # list. Joining many rooms inside one handler lets a message-queue
+        # adapter pipeline the subscribes instead of paying one client
+        # round-trip per room.
+        for conversation_id in _conversation_ids(data):
             join_room(f"conversation_{conversation_id}")
 
     @socketio.on("leave_conversation")
     def handle_leave_conversation(data):
-        conversation_id = data.get("conversation_id")
-        if conversation_id:
-            from flask_socketio import leave_room
+        for conversation_id in _conversation_ids(data):
             leave_room(f"conversation_{conversation_id}")
 
     @socketio.on("mark_read")
     def handle_mark_read(data):
         conversation_id = data.get("conversation_id")
         if conversation_id:
-            mark_messages_read(conversation_id)
+            mark_messages_read_async(conversation_id)
 
     @socketio.on("admin_typing")
     def handle_admin_typing(data):
@@ -64,3 +64,12 @@ def register_socketio_events(socketio):
                 "admin_id": admin_id,
                 "username": session.get("admin_username", ""),
             }, room=f"conversation_{conversation_id}", include_self=False)
+
+
+def _conversation_ids(data):
+    """Pull conversation ids out of an event payload, singular or plural."""
+    ids = data.get("conversation_ids")
+    if ids:
+        return [i for i in ids if i]
+    conversation_id = data.get("conversation_id")
+    return [conversation_id] if conversation_id else []
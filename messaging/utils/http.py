@@ -0,0 +1,66 @@
+"""
+Shared outbound HTTP session for the service layer.
+
+The AI providers and channel verification each used module-level
+requests.get/post, which opens and tears down a TCP+TLS connection per
+call. One pooled session keeps connections to api.openai.com,
+api.anthropic.com, graph.facebook.com etc. alive across calls, and adds
+a small retry budget for transient upstream errors. Auth stays in
+per-call headers — nothing org-specific lives on the session.
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "64"))
+
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=_POOL_MAXSIZE,
+    # Transient 429/5xx are retried here, at the transport, where the
+    # connection is already warm — callers see only the final outcome.
+    # Retry-After from rate-limited providers is honored by default;
+    # backoff otherwise grows 0.5s/1s/2s, bounded so an AI worker is
+    # never pinned for minutes on a dead upstream.
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "POST"),
+    ),
+)
+
+SESSION = requests.Session()
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+# Hosts the app talks to in the normal course of a conversation. Warmed
+# at startup so the first real call skips DNS + TCP + TLS (~150-300ms).
+_WARMUP_HOSTS = (
+    "https://api.openai.com",
+    "https://api.anthropic.com",
+    "https://generativelanguage.googleapis.com",
+    "https://graph.facebook.com",
+    "https://api.line.me",
+)
+
+
+def warmup():
+    """Pre-open pooled connections to upstream hosts in the background.
+
+    Fire-and-forget: failures are expected (no network, host blocks
+    HEAD) and only mean the first real request pays the handshake it
+    would have paid anyway.
+    """
+    def _warm():
+        for url in _WARMUP_HOSTS:
+            try:
+                SESSION.head(url, timeout=2)
+            except requests.RequestException:
+                pass
+
+    threading.Thread(target=_warm, name="http-warmup", daemon=True).start()
@@ -3,20 +3,76 @@ Database layer for the messaging platform.
 All messaging-related tables and queries live here.
 """
 
-import json
+import queue
+import threading
+import time
 from datetime import datetime
+from functools import lru_cache
+
+import orjson
+
 from database import get_db
 
 
+@lru_cache(maxsize=256)
+def _update_sql(table, columns, bump_updated_at=False):
+    """Build a dynamic UPDATE statement, memoized per column subset.
+
+    Callers pass only a handful of distinct field combinations, so this
+    keeps the generated SQL text stable — which also lets sqlite3's
+    per-connection statement cache reuse the prepared statement instead
+    of re-parsing a fresh string on every call.
+    """
+    set_clause = ", ".join(f"{c} = ?" for c in columns)
+    if bump_updated_at:
+        set_clause += ", updated_at = CURRENT_TIMESTAMP"
+    return f"UPDATE {table} SET {set_clause} WHERE id = ?"
+
+
 # ============================================================
 # Schema Initialization
 # ============================================================
 
 
+# Bump whenever _run_migrations gains a step. A matching value in
+# schema_meta means every migration below has already been applied, so
+# init can skip the PRAGMA table_info scans and ALTER checks entirely —
+# they only cost milliseconds, but they run on every worker start.
+_SCHEMA_VERSION = "2"
+
+
 def init_messaging_db():
-    """Create all messaging tables and run migrations."""
+    """Create all messaging tables, run migrations, then build indexes."""
     conn = get_db()
+    _create_tables(conn)
 
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_meta (key TEXT PRIMARY KEY, value TEXT)")
+    version = conn.execute(
+        "SELECT value FROM schema_meta WHERE key = 'schema_version'"
+    ).fetchone()
+    if version is None or version[0] != _SCHEMA_VERSION:
+        _run_migrations(conn)
+        conn.execute(
+            """INSERT INTO schema_meta (key, value) VALUES ('schema_version', ?)
+               ON CONFLICT(key) DO UPDATE SET value = excluded.value""",
+            (_SCHEMA_VERSION,),
+        )
+
+    _create_search_tables(conn)
+    _create_indexes(conn)
+
+    # Give the planner stats for the indexes created above — usually a
+    # no-op, but after a migration it triggers ANALYZE where it pays off
+    # for the join-heavy conversation queries. analysis_limit=0 removes
+    # the row-scan cap so large databases still get full stats.
+    conn.execute("PRAGMA analysis_limit=0")
+    conn.execute("PRAGMA optimize")
+
+    conn.commit()
+    conn.close()
+
+
+def _create_tables(conn):
     conn.execute("""
         CREATE TABLE IF NOT EXISTS organizations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -140,16 +196,6 @@ def init_messaging_db():
         )
     """)
 
-    conn.execute("""
-        CREATE INDEX IF NOT EXISTS idx_messages_conversation
-        ON messages(conversation_id, created_at)
-    """)
-
-    conn.execute("""
-        CREATE INDEX IF NOT EXISTS idx_messages_platform_id
-        ON messages(platform_message_id)
-    """)
-
     conn.execute("""
         CREATE TABLE IF NOT EXISTS message_templates (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -211,6 +257,8 @@ def init_messaging_db():
         )
     """)
 
+
+def _run_migrations(conn):
     # --- Migrations for admins table ---
     admin_columns = [row[1] for row in conn.execute("PRAGMA table_info(admins)").fetchall()]
     if "org_id" not in admin_columns:
@@ -223,11 +271,11 @@ def init_messaging_db():
     # --- Create default organization and assign existing admins ---
     default_org = conn.execute("SELECT id FROM organizations WHERE slug = 'default'").fetchone()
     if not default_org:
-        conn.execute(
+        cursor = conn.execute(
             "INSERT INTO organizations (name, slug, plan) VALUES (?, ?, ?)",
             ("Default Organization", "default", "pro"),
         )
-        default_org_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        default_org_id = cursor.lastrowid
         conn.execute("UPDATE admins SET org_id = ? WHERE org_id IS NULL", (default_org_id,))
     else:
         default_org_id = default_org[0]
@@ -238,8 +286,261 @@ def init_messaging_db():
     if "is_pinned" not in conv_columns:
         conn.execute("ALTER TABLE conversations ADD COLUMN is_pinned INTEGER DEFAULT 0")
 
-    conn.commit()
-    conn.close()
+    # --- Persisted numeric priority rank ---
+    # The conversation list sorted on CASE priority ... END, an
+    # expression the planner can't match to an index. A virtual
+    # generated column makes the rank a first-class, indexable column
+    # with no storage cost and no writer to keep in sync. table_xinfo
+    # because table_info hides generated columns.
+    conv_xcolumns = [row[1] for row in conn.execute("PRAGMA table_xinfo(conversations)").fetchall()]
+    if "priority_rank" not in conv_xcolumns:
+        conn.execute(
+            """ALTER TABLE conversations ADD COLUMN priority_rank INTEGER
+               GENERATED ALWAYS AS
+               (CASE priority WHEN 'urgent' THEN 0 WHEN 'high' THEN 1 ELSE 2 END) VIRTUAL"""
+        )
+
+    # --- Typed admin reference on messages ---
+    # sender_id is TEXT (platform user ids share the column); joining
+    # admins through CAST(sender_id AS INTEGER) blocked the admins PK
+    # index. sender_admin_id carries the same value typed, so the join
+    # is an indexed PK lookup.
+    msg_columns = [row[1] for row in conn.execute("PRAGMA table_info(messages)").fetchall()]
+    if "sender_admin_id" not in msg_columns:
+        conn.execute("ALTER TABLE messages ADD COLUMN sender_admin_id INTEGER DEFAULT NULL")
+        conn.execute(
+            "UPDATE messages SET sender_admin_id = CAST(sender_id AS INTEGER) "
+            "WHERE sender_type = 'admin' AND sender_id GLOB '[0-9]*'"
+        )
+
+    # --- Denormalized per-org counters ---
+    # get_messaging_overview reads these instead of COUNT-scanning the
+    # conversations/messages/contacts tables on every dashboard load.
+    # Triggers keep them current inside the same transaction as the write.
+    org_columns = [row[1] for row in conn.execute("PRAGMA table_info(organizations)").fetchall()]
+    counters_fresh = "conversations_count" not in org_columns
+    if counters_fresh:
+        conn.execute("ALTER TABLE organizations ADD COLUMN conversations_count INTEGER DEFAULT 0")
+        conn.execute("ALTER TABLE organizations ADD COLUMN conversations_open_count INTEGER DEFAULT 0")
+        conn.execute("ALTER TABLE organizations ADD COLUMN messages_count INTEGER DEFAULT 0")
+        conn.execute("ALTER TABLE organizations ADD COLUMN contacts_count INTEGER DEFAULT 0")
+
+    conn.executescript("""
+        CREATE TRIGGER IF NOT EXISTS org_conv_ai AFTER INSERT ON conversations BEGIN
+            UPDATE organizations SET
+                conversations_count = conversations_count + 1,
+                conversations_open_count = conversations_open_count
+                    + (NEW.status IN ('open', 'assigned'))
+            WHERE id = NEW.org_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS org_conv_ad AFTER DELETE ON conversations BEGIN
+            UPDATE organizations SET
+                conversations_count = conversations_count - 1,
+                conversations_open_count = conversations_open_count
+                    - (OLD.status IN ('open', 'assigned'))
+            WHERE id = OLD.org_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS org_conv_au AFTER UPDATE OF status ON conversations BEGIN
+            UPDATE organizations SET
+                conversations_open_count = conversations_open_count
+                    + (NEW.status IN ('open', 'assigned'))
+                    - (OLD.status IN ('open', 'assigned'))
+            WHERE id = NEW.org_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS org_msg_ai AFTER INSERT ON messages BEGIN
+            UPDATE organizations SET messages_count = messages_count + 1 WHERE id = NEW.org_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS org_msg_ad AFTER DELETE ON messages BEGIN
+            UPDATE organizations SET messages_count = messages_count - 1 WHERE id = OLD.org_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS org_contact_ai AFTER INSERT ON contacts BEGIN
+            UPDATE organizations SET contacts_count = contacts_count + 1 WHERE id = NEW.org_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS org_contact_ad AFTER DELETE ON contacts BEGIN
+            UPDATE organizations SET contacts_count = contacts_count - 1 WHERE id = OLD.org_id;
+        END;
+    """)
+
+    if counters_fresh:
+        # One-time backfill for rows written before the counters existed
+        conn.execute("""
+            UPDATE organizations SET
+                conversations_count = (SELECT COUNT(*) FROM conversations WHERE org_id = organizations.id),
+                conversations_open_count = (SELECT COUNT(*) FROM conversations
+                    WHERE org_id = organizations.id AND status IN ('open', 'assigned')),
+                messages_count = (SELECT COUNT(*) FROM messages WHERE org_id = organizations.id),
+                contacts_count = (SELECT COUNT(*) FROM contacts WHERE org_id = organizations.id)
+        """)
+
+
+def _create_search_tables(conn):
+    """Full-text indexes over the searchable contact and conversation
+    columns (external-content tables kept in sync by triggers), same
+    scheme as customers_fts in database.py. Search hits the FTS index
+    instead of a leading-wildcard LIKE scan.
+
+    Each FTS table shadows exactly one base table so the triggers stay
+    trivial; conversation search ORs the two indexes together rather
+    than denormalizing contact names into a conversations_fts copy that
+    would go stale on contact renames.
+    """
+    contacts_fts_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contacts_fts'"
+    ).fetchone()
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+            display_name, platform_user_id, customer_code, email,
+            content='contacts', content_rowid='id'
+        )
+    """)
+    # Update trigger fires only on the indexed columns, not on the
+    # last_seen_at bump every inbound message performs
+    conn.executescript("""
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN
+            INSERT INTO contacts_fts(rowid, display_name, platform_user_id, customer_code, email)
+            VALUES (new.id, new.display_name, new.platform_user_id, new.customer_code, new.email);
+        END;
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN
+            INSERT INTO contacts_fts(contacts_fts, rowid, display_name, platform_user_id, customer_code, email)
+            VALUES ('delete', old.id, old.display_name, old.platform_user_id, old.customer_code, old.email);
+        END;
+        CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE OF display_name, platform_user_id, customer_code, email ON contacts BEGIN
+            INSERT INTO contacts_fts(contacts_fts, rowid, display_name, platform_user_id, customer_code, email)
+            VALUES ('delete', old.id, old.display_name, old.platform_user_id, old.customer_code, old.email);
+            INSERT INTO contacts_fts(rowid, display_name, platform_user_id, customer_code, email)
+            VALUES (new.id, new.display_name, new.platform_user_id, new.customer_code, new.email);
+        END;
+    """)
+    if not contacts_fts_exists:
+        conn.execute("INSERT INTO contacts_fts(contacts_fts) VALUES('rebuild')")
+
+    conversations_fts_exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversations_fts'"
+    ).fetchone()
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+            last_message_preview,
+            content='conversations', content_rowid='id'
+        )
+    """)
+    conn.executescript("""
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_ai AFTER INSERT ON conversations BEGIN
+            INSERT INTO conversations_fts(rowid, last_message_preview)
+            VALUES (new.id, new.last_message_preview);
+        END;
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_ad AFTER DELETE ON conversations BEGIN
+            INSERT INTO conversations_fts(conversations_fts, rowid, last_message_preview)
+            VALUES ('delete', old.id, old.last_message_preview);
+        END;
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_au AFTER UPDATE OF last_message_preview ON conversations BEGIN
+            INSERT INTO conversations_fts(conversations_fts, rowid, last_message_preview)
+            VALUES ('delete', old.id, old.last_message_preview);
+            INSERT INTO conversations_fts(rowid, last_message_preview)
+            VALUES (new.id, new.last_message_preview);
+        END;
+    """)
+    if not conversations_fts_exists:
+        conn.execute("INSERT INTO conversations_fts(conversations_fts) VALUES('rebuild')")
+
+
+def _fts_prefix_query(search):
+    """Quote a raw search term as an FTS5 prefix phrase."""
+    return '"%s"*' % search.replace('"', '""')
+
+
+def _create_indexes(conn):
+    """Create all secondary indexes.
+
+    Runs after tables and migrations so a first boot that bulk-loads
+    existing data builds each B-tree once at the end instead of
+    maintaining it insert by insert.
+    """
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation
+        ON messages(conversation_id, created_at)
+    """)
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_platform_id
+        ON messages(platform_message_id)
+    """)
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_org_conv
+        ON messages(org_id, conversation_id, created_at)
+    """)
+
+    # Partial: only admin-sent rows carry sender_admin_id, so the index
+    # stays small and the admins join is a PK lookup
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_sender_admin
+        ON messages(sender_admin_id) WHERE sender_admin_id IS NOT NULL
+    """)
+
+    # Covers the analytics aggregations over contact messages (top
+    # contacts, hourly/daily/monthly counts) without touching the table
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_org_sender_conv
+        ON messages(org_id, sender_type, conversation_id, created_at)
+    """)
+
+    # Streams the conversation list's full sort order straight off the
+    # B-tree instead of materializing and sorting the filtered set
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conv_sorted
+        ON conversations(org_id, is_pinned DESC, priority_rank,
+                         COALESCE(last_message_at, created_at) DESC, id DESC)
+    """)
+
+    # find_or_create_conversation runs on every inbound message and asks
+    # for the newest open/assigned conversation of one contact; a partial
+    # index over just the active rows answers it without scanning the
+    # contact's resolved history
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conv_active_contact
+        ON conversations(contact_id, created_at DESC)
+        WHERE status IN ('open', 'assigned')
+    """)
+
+    # Serves the contact list's (last_seen_at, id) sort and keyset cursor
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_contacts_org_seen
+        ON contacts(org_id, last_seen_at DESC, id DESC)
+    """)
+
+    # Conversation list: filter by org (and status tab) sorted by recency
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conv_org_status
+        ON conversations(org_id, status, last_message_at DESC)
+    """)
+
+    # find_or_create_conversation's contact lookup and per-contact history
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conv_contact
+        ON conversations(contact_id, status)
+    """)
+
+    # "my conversations" filters and the assignment join to admins
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_conv_assigned
+        ON conversations(assigned_admin_id)
+    """)
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ai_providers_org_default
+        ON ai_providers(org_id, is_default, is_active)
+    """)
+
+    # Notification bell: newest (optionally unread) rows for one admin
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notifications_admin_created
+        ON admin_notifications(admin_id, is_read, created_at DESC)
+    """)
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_templates_org_active
+        ON message_templates(org_id, is_active, category)
+    """)
 
 
 # ============================================================
@@ -247,19 +548,90 @@ def init_messaging_db():
 # ============================================================
 
 
+# Org rows are read on every webhook event (AI toggle, public URL) but
+# change rarely — serve them from a short TTL cache. update_org drops the
+# entry so edits show up immediately; the TTL only bounds staleness for
+# writes that bypass this module.
+_ORG_CACHE_TTL = 30
+_org_cache = {}
+_org_cache_lock = threading.Lock()
+
+
 def get_org_by_id(org_id):
+    now = time.time()
+    with _org_cache_lock:
+        cached = _org_cache.get(org_id)
+        if cached and now - cached[0] < _ORG_CACHE_TTL:
+            return cached[1]
     conn = get_db()
     org = conn.execute("SELECT * FROM organizations WHERE id = ?", (org_id,)).fetchone()
     conn.close()
+    with _org_cache_lock:
+        _org_cache[org_id] = (now, org)
     return org
 
 
+# Admin→org membership is read on every authenticated request and only
+# ever written by the start-up migration, so a short TTL turns the
+# lookup into a dict hit; the TTL bounds staleness if the DB is ever
+# edited directly.
+_ADMIN_ORG_CACHE_TTL = 60
+_admin_org_cache = {}
+_admin_org_cache_lock = threading.Lock()
+
+
 def get_admin_org_id(admin_id):
     """Get the org_id for an admin."""
+    now = time.time()
+    with _admin_org_cache_lock:
+        cached = _admin_org_cache.get(admin_id)
+        if cached and now - cached[0] < _ADMIN_ORG_CACHE_TTL:
+            return cached[1]
     conn = get_db()
+    # Scalar fetch: Row's lookup-by-name walks the cursor description on
+    # every access
     admin = conn.execute("SELECT org_id FROM admins WHERE id = ?", (admin_id,)).fetchone()
     conn.close()
-    return admin["org_id"] if admin else None
+    org_id = admin[0] if admin else None
+    if org_id is not None:
+        with _admin_org_cache_lock:
+            _admin_org_cache[admin_id] = (now, org_id)
+    return org_id
+
+
+def get_org_settings(org_id):
+    """Parsed settings dict for an org, reading only the settings column.
+
+    Returns None when the org doesn't exist.
+    """
+    conn = get_db()
+    row = conn.execute("SELECT settings_json FROM organizations WHERE id = ?", (org_id,)).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    return orjson.loads(row["settings_json"] or "{}")
+
+
+def update_org_setting(org_id, key, value):
+    """Set one settings key atomically via json_set.
+
+    The whole read-modify-write happens inside the UPDATE, so concurrent
+    writers touching different keys can't clobber each other. The value
+    goes through json() so booleans and strings keep their JSON types.
+    Returns False when the org doesn't exist.
+    """
+    conn = get_db()
+    cursor = conn.execute(
+        "UPDATE organizations SET"
+        " settings_json = json_set(COALESCE(settings_json, '{}'), '$.' || ?, json(?)),"
+        " updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+        (key, orjson.dumps(value).decode("utf-8"), org_id),
+    )
+    conn.commit()
+    conn.close()
+    with _org_cache_lock:
+        _org_cache.pop(org_id, None)
+    return cursor.rowcount > 0
 
 
 def update_org(org_id, **fields):
@@ -267,12 +639,13 @@ def update_org(org_id, **fields):
     updates = {k: v for k, v in fields.items() if k in allowed and v is not None}
     if not updates:
         return
-    set_clause = ", ".join(f"{k} = ?" for k in updates)
     values = list(updates.values()) + [org_id]
     conn = get_db()
-    conn.execute(f"UPDATE organizations SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = ?", values)
+    conn.execute(_update_sql("organizations", tuple(updates), bump_updated_at=True), values)
     conn.commit()
     conn.close()
+    with _org_cache_lock:
+        _org_cache.pop(org_id, None)
 
 
 # ============================================================
@@ -292,10 +665,25 @@ def create_channel(org_id, channel_type, name):
     return channel_id
 
 
+# Channel rows are looked up by every webhook event and every send but
+# change only from the settings screen — same treatment as org rows: a
+# short TTL cache with writers dropping the entry.
+_CHANNEL_CACHE_TTL = 60
+_channel_cache = {}
+_channel_cache_lock = threading.Lock()
+
+
 def get_channel(channel_id):
+    now = time.time()
+    with _channel_cache_lock:
+        cached = _channel_cache.get(channel_id)
+        if cached and now - cached[0] < _CHANNEL_CACHE_TTL:
+            return cached[1]
     conn = get_db()
     channel = conn.execute("SELECT * FROM channels WHERE id = ?", (channel_id,)).fetchone()
     conn.close()
+    with _channel_cache_lock:
+        _channel_cache[channel_id] = (now, channel)
     return channel
 
 
@@ -314,39 +702,71 @@ def update_channel(channel_id, **fields):
     updates = {k: v for k, v in fields.items() if k in allowed and v is not None}
     if not updates:
         return
-    set_clause = ", ".join(f"{k} = ?" for k in updates)
     values = list(updates.values()) + [channel_id]
     conn = get_db()
-    conn.execute(f"UPDATE channels SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = ?", values)
+    conn.execute(_update_sql("channels", tuple(updates), bump_updated_at=True), values)
     conn.commit()
     conn.close()
+    with _channel_cache_lock:
+        _channel_cache.pop(channel_id, None)
 
 
 def delete_channel(channel_id):
     conn = get_db()
+    # Both deletes commit as one write transaction; the immediate lock
+    # avoids a mid-transaction upgrade if a webhook write lands between
+    # them. Credentials go first so the subtree is never half-orphaned.
+    conn.execute("BEGIN IMMEDIATE")
     conn.execute("DELETE FROM channel_credentials WHERE channel_id = ?", (channel_id,))
     conn.execute("DELETE FROM channels WHERE id = ?", (channel_id,))
     conn.commit()
     conn.close()
+    with _channel_cache_lock:
+        _channel_cache.pop(channel_id, None)
 
 
 def set_channel_credentials(channel_id, encrypted_creds, credential_type):
     conn = get_db()
-    existing = conn.execute("SELECT id FROM channel_credentials WHERE channel_id = ?", (channel_id,)).fetchone()
-    if existing:
-        conn.execute(
-            "UPDATE channel_credentials SET encrypted_credentials = ?, credential_type = ?, updated_at = CURRENT_TIMESTAMP WHERE channel_id = ?",
-            (encrypted_creds, credential_type, channel_id),
-        )
-    else:
-        conn.execute(
-            "INSERT INTO channel_credentials (channel_id, encrypted_credentials, credential_type) VALUES (?, ?, ?)",
-            (channel_id, encrypted_creds, credential_type),
-        )
+    conn.execute(
+        """INSERT INTO channel_credentials (channel_id, encrypted_credentials, credential_type)
+           VALUES (?, ?, ?)
+           ON CONFLICT(channel_id) DO UPDATE SET
+               encrypted_credentials = excluded.encrypted_credentials,
+               credential_type = excluded.credential_type,
+               updated_at = CURRENT_TIMESTAMP""",
+        (channel_id, encrypted_creds, credential_type),
+    )
     conn.commit()
     conn.close()
 
 
+def get_channel_with_credentials(channel_id):
+    """Fetch a channel and its encrypted credentials in one query.
+
+    Returns (channel, encrypted_credentials); encrypted_credentials is
+    None when no credentials are stored, both are None when the channel
+    does not exist. Only the channels columns are planted in the channel
+    cache — the ciphertext must never reach get_channel callers — so a
+    cold webhook still costs one round-trip instead of two.
+    """
+    conn = get_db()
+    row = conn.execute(
+        """SELECT c.*, cc.encrypted_credentials
+           FROM channels c
+           LEFT JOIN channel_credentials cc ON cc.channel_id = c.id
+           WHERE c.id = ?""",
+        (channel_id,),
+    ).fetchone()
+    conn.close()
+    if row is None:
+        return None, None
+    channel = dict(row)
+    encrypted_credentials = channel.pop("encrypted_credentials")
+    with _channel_cache_lock:
+        _channel_cache[channel_id] = (time.time(), channel)
+    return channel, encrypted_credentials
+
+
 def get_channel_credentials(channel_id):
     conn = get_db()
     cred = conn.execute("SELECT * FROM channel_credentials WHERE channel_id = ?", (channel_id,)).fetchone()
@@ -431,9 +851,8 @@ def update_ai_provider(provider_id, **fields):
         provider = conn.execute("SELECT org_id FROM ai_providers WHERE id = ?", (provider_id,)).fetchone()
         if provider:
             conn.execute("UPDATE ai_providers SET is_default = 0 WHERE org_id = ?", (provider["org_id"],))
-    set_clause = ", ".join(f"{k} = ?" for k in updates)
     values = list(updates.values()) + [provider_id]
-    conn.execute(f"UPDATE ai_providers SET {set_clause} WHERE id = ?", values)
+    conn.execute(_update_sql("ai_providers", tuple(updates)), values)
     conn.commit()
     conn.close()
 
@@ -451,27 +870,24 @@ def delete_ai_provider(provider_id):
 
 
 def find_or_create_contact(org_id, channel_id, platform_user_id, display_name="", avatar_url=""):
+    # One upsert instead of SELECT then INSERT-or-UPDATE: the seen-again
+    # case (every message after the first) does a single B-tree probe,
+    # and concurrent deliveries can't race between the check and the
+    # insert. Empty profile fields never overwrite known values.
     conn = get_db()
-    contact = conn.execute(
-        "SELECT * FROM contacts WHERE channel_id = ? AND platform_user_id = ?",
-        (channel_id, platform_user_id),
+    row = conn.execute(
+        """INSERT INTO contacts (org_id, channel_id, platform_user_id, display_name, avatar_url)
+           VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT(channel_id, platform_user_id) DO UPDATE SET
+               last_seen_at = CURRENT_TIMESTAMP,
+               display_name = COALESCE(NULLIF(excluded.display_name, ''), display_name),
+               avatar_url = COALESCE(NULLIF(excluded.avatar_url, ''), avatar_url)
+           RETURNING id""",
+        (org_id, channel_id, platform_user_id, display_name, avatar_url),
     ).fetchone()
-    if contact:
-        conn.execute(
-            "UPDATE contacts SET last_seen_at = CURRENT_TIMESTAMP, display_name = COALESCE(NULLIF(?, ''), display_name), avatar_url = COALESCE(NULLIF(?, ''), avatar_url) WHERE id = ?",
-            (display_name, avatar_url, contact["id"]),
-        )
-        conn.commit()
-        contact_id = contact["id"]
-    else:
-        cursor = conn.execute(
-            "INSERT INTO contacts (org_id, channel_id, platform_user_id, display_name, avatar_url) VALUES (?, ?, ?, ?, ?)",
-            (org_id, channel_id, platform_user_id, display_name, avatar_url),
-        )
-        contact_id = cursor.lastrowid
-        conn.commit()
+    conn.commit()
     conn.close()
-    return contact_id
+    return row[0]
 
 
 def get_contact(contact_id):
@@ -481,16 +897,32 @@ def get_contact(contact_id):
     return contact
 
 
-def get_contacts_for_org(org_id, search=None, limit=50, offset=0):
+def get_contacts_for_org(org_id, search=None, limit=50, offset=0, after_id=None, tag=None):
     conn = get_db()
     query = "SELECT * FROM contacts WHERE org_id = ?"
     params = [org_id]
+    if tag:
+        # Filter inside SQL via json_each instead of shipping every row
+        # to Python and parsing tags_json there
+        query += " AND EXISTS (SELECT 1 FROM json_each(contacts.tags_json) WHERE json_each.value = ?)"
+        params.append(tag)
     if search:
-        query += " AND (display_name LIKE ? OR platform_user_id LIKE ? OR customer_code LIKE ? OR email LIKE ?)"
-        term = f"%{search}%"
-        params.extend([term, term, term, term])
-    query += " ORDER BY last_seen_at DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+        # Prefix match against the FTS index — avoids the 4-column
+        # leading-wildcard LIKE scan
+        query += " AND id IN (SELECT rowid FROM contacts_fts WHERE contacts_fts MATCH ?)"
+        params.append(_fts_prefix_query(search))
+    if after_id is not None:
+        # Keyset cursor: resume strictly after the given contact in the
+        # (last_seen_at, id) sort order. Each page is O(limit) no matter
+        # how deep, where OFFSET has to scan and discard every earlier row.
+        query += (" AND (last_seen_at, id) <"
+                  " (SELECT last_seen_at, id FROM contacts WHERE id = ?)")
+        params.append(after_id)
+        query += " ORDER BY last_seen_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+    else:
+        query += " ORDER BY last_seen_at DESC, id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
     contacts = conn.execute(query, params).fetchall()
     conn.close()
     return contacts
@@ -501,10 +933,9 @@ def update_contact(contact_id, **fields):
     updates = {k: v for k, v in fields.items() if k in allowed and v is not None}
     if not updates:
         return
-    set_clause = ", ".join(f"{k} = ?" for k in updates)
     values = list(updates.values()) + [contact_id]
     conn = get_db()
-    conn.execute(f"UPDATE contacts SET {set_clause} WHERE id = ?", values)
+    conn.execute(_update_sql("contacts", tuple(updates)), values)
     conn.commit()
     conn.close()
 
@@ -516,12 +947,14 @@ def update_contact(contact_id, **fields):
 
 def find_or_create_conversation(org_id, channel_id, contact_id):
     conn = get_db()
+    # Only the id is needed, and fetching just it keeps the lookup
+    # covered by idx_conv_active_contact instead of touching the row
     conv = conn.execute(
-        "SELECT * FROM conversations WHERE contact_id = ? AND status IN ('open', 'assigned') ORDER BY created_at DESC LIMIT 1",
+        "SELECT id FROM conversations WHERE contact_id = ? AND status IN ('open', 'assigned') ORDER BY created_at DESC LIMIT 1",
         (contact_id,),
     ).fetchone()
     if conv:
-        conv_id = conv["id"]
+        conv_id = conv[0]
     else:
         cursor = conn.execute(
             "INSERT INTO conversations (org_id, channel_id, contact_id) VALUES (?, ?, ?)",
@@ -549,7 +982,7 @@ def get_conversation(conversation_id):
 
 
 def get_conversations_for_org(org_id, status=None, channel_id=None, assigned_admin_id=None,
-                               search=None, limit=50, offset=0):
+                               search=None, limit=50, offset=0, after_id=None):
     conn = get_db()
     query = """SELECT c.*, ct.display_name AS contact_name, ct.avatar_url AS contact_avatar,
                       ct.platform_user_id, ch.channel_type, ch.name AS channel_name,
@@ -570,11 +1003,33 @@ def get_conversations_for_org(org_id, status=None, channel_id=None, assigned_adm
         query += " AND c.assigned_admin_id = ?"
         params.append(assigned_admin_id)
     if search:
-        term = f"%{search}%"
-        query += " AND (ct.display_name LIKE ? OR c.last_message_preview LIKE ? OR ct.platform_user_id LIKE ?)"
-        params.extend([term, term, term])
-    query += " ORDER BY c.is_pinned DESC, CASE c.priority WHEN 'urgent' THEN 0 WHEN 'high' THEN 1 ELSE 2 END, c.last_message_at DESC NULLS LAST, c.created_at DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+        fts_term = _fts_prefix_query(search)
+        query += (" AND (c.contact_id IN (SELECT rowid FROM contacts_fts WHERE contacts_fts MATCH ?)"
+                  " OR c.id IN (SELECT rowid FROM conversations_fts WHERE conversations_fts MATCH ?))")
+        params.extend([fts_term, fts_term])
+    if after_id is not None:
+        # Keyset cursor over the full (pinned, priority, recency, id)
+        # sort tuple, resolved from the cursor row by id like the
+        # contacts cursor. Priority is inverted (urgent = 2) so every
+        # component descends and a single row-value < works; NULL
+        # last_message_at falls back to created_at so the comparison
+        # never NULLs out. O(limit) at any depth, where OFFSET reads and
+        # discards every earlier row.
+        query += (" AND (c.is_pinned, 2 - c.priority_rank,"
+                  " COALESCE(c.last_message_at, c.created_at), c.id) <"
+                  " (SELECT is_pinned, 2 - priority_rank,"
+                  " COALESCE(last_message_at, created_at), id"
+                  " FROM conversations WHERE id = ?)")
+        params.append(after_id)
+        query += (" ORDER BY c.is_pinned DESC, c.priority_rank,"
+                  " COALESCE(c.last_message_at, c.created_at) DESC, c.id DESC LIMIT ?")
+        params.append(limit)
+    else:
+        # Same COALESCE recency key as the keyset branch, so a client can
+        # fetch page one by offset and continue with the cursor without
+        # rows shifting between the two orderings
+        query += " ORDER BY c.is_pinned DESC, c.priority_rank, COALESCE(c.last_message_at, c.created_at) DESC, c.id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
     conversations = conn.execute(query, params).fetchall()
     conn.close()
     return conversations
@@ -586,10 +1041,9 @@ def update_conversation(conversation_id, **fields):
     updates = {k: v for k, v in fields.items() if k in allowed}
     if not updates:
         return
-    set_clause = ", ".join(f"{k} = ?" for k in updates)
     values = list(updates.values()) + [conversation_id]
     conn = get_db()
-    conn.execute(f"UPDATE conversations SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = ?", values)
+    conn.execute(_update_sql("conversations", tuple(updates), bump_updated_at=True), values)
     conn.commit()
     conn.close()
 
@@ -599,6 +1053,13 @@ def update_conversation(conversation_id, **fields):
 # ============================================================
 
 
+def _admin_id_or_none(sender_type, sender_id):
+    """Typed value for messages.sender_admin_id; NULL for non-admin rows."""
+    if sender_type == "admin" and str(sender_id).isdigit():
+        return int(sender_id)
+    return None
+
+
 def add_message(conversation_id, org_id, sender_type, content, sender_id="",
                 message_type="text", metadata_json="{}", platform_message_id=""):
     conn = get_db()
@@ -610,12 +1071,17 @@ def add_message(conversation_id, org_id, sender_type, content, sender_id="",
         ).fetchone()
         if existing:
             conn.close()
-            return existing["id"]
+            return existing[0]
+    # Take the write lock up front: deferred transactions that upgrade
+    # mid-way are what produce SQLITE_BUSY when webhook workers collide.
+    # The INSERT and conversation UPDATE then commit as one fsync.
+    conn.execute("BEGIN IMMEDIATE")
     cursor = conn.execute(
         """INSERT INTO messages
-           (conversation_id, org_id, sender_type, sender_id, message_type, content, metadata_json, platform_message_id)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-        (conversation_id, org_id, sender_type, sender_id, message_type, content, metadata_json, platform_message_id),
+           (conversation_id, org_id, sender_type, sender_id, sender_admin_id, message_type, content, metadata_json, platform_message_id)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (conversation_id, org_id, sender_type, sender_id, _admin_id_or_none(sender_type, sender_id),
+         message_type, content, metadata_json, platform_message_id),
     )
     message_id = cursor.lastrowid
     # Update conversation
@@ -631,6 +1097,44 @@ def add_message(conversation_id, org_id, sender_type, content, sender_id="",
     return message_id
 
 
+def add_messages_bulk(rows):
+    """Insert many messages in one transaction — one fsync for the lot.
+
+    rows: (conversation_id, org_id, sender_type, sender_id, message_type,
+    content, metadata_json, platform_message_id) tuples, in delivery
+    order. Each touched conversation gets a single aggregated update
+    (preview from its last row, unread bumped by its contact-message
+    count) instead of one per message. No per-row duplicate check — the
+    caller is expected to have deduplicated, as the webhook path does.
+    """
+    if not rows:
+        return
+    conn = get_db()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany(
+        """INSERT INTO messages
+           (conversation_id, org_id, sender_type, sender_id, sender_admin_id, message_type, content, metadata_json, platform_message_id)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [row[:4] + (_admin_id_or_none(row[2], row[3]),) + row[4:] for row in rows],
+    )
+    last_row = {}
+    unread_bump = {}
+    for row in rows:
+        conversation_id = row[0]
+        last_row[conversation_id] = row
+        if row[2] == "contact":
+            unread_bump[conversation_id] = unread_bump.get(conversation_id, 0) + 1
+    for conversation_id, row in last_row.items():
+        preview = row[5][:100] if row[5] else ""
+        conn.execute(
+            """UPDATE conversations SET last_message_at = CURRENT_TIMESTAMP, last_message_preview = ?,
+               unread_count = unread_count + ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?""",
+            (preview, unread_bump.get(conversation_id, 0), conversation_id),
+        )
+    conn.commit()
+    conn.close()
+
+
 def get_messages_for_conversation(conversation_id, limit=50, offset=0, before_id=None):
     conn = get_db()
     if before_id:
@@ -639,7 +1143,7 @@ def get_messages_for_conversation(conversation_id, limit=50, offset=0, before_id
             """SELECT * FROM (
                  SELECT m.*, a.username AS admin_username, a.display_name AS admin_display_name
                  FROM messages m
-                 LEFT JOIN admins a ON m.sender_type = 'admin' AND CAST(m.sender_id AS INTEGER) = a.id
+                 LEFT JOIN admins a ON m.sender_admin_id = a.id
                  WHERE m.conversation_id = ? AND m.id < ?
                  ORDER BY m.created_at DESC
                  LIMIT ?
@@ -652,7 +1156,7 @@ def get_messages_for_conversation(conversation_id, limit=50, offset=0, before_id
             """SELECT * FROM (
                  SELECT m.*, a.username AS admin_username, a.display_name AS admin_display_name
                  FROM messages m
-                 LEFT JOIN admins a ON m.sender_type = 'admin' AND CAST(m.sender_id AS INTEGER) = a.id
+                 LEFT JOIN admins a ON m.sender_admin_id = a.id
                  WHERE m.conversation_id = ?
                  ORDER BY m.created_at DESC
                  LIMIT ? OFFSET ?
@@ -663,6 +1167,32 @@ def get_messages_for_conversation(conversation_id, limit=50, offset=0, before_id
     return messages
 
 
+def get_all_messages_for_org(org_id):
+    """Stream every message for an org joined with its conversation,
+    contact, and channel — one query for whole-org exports instead of a
+    per-conversation fetch loop. Rows are grouped by conversation and
+    ordered chronologically within each one.
+    """
+    conn = get_db()
+    try:
+        yield from conn.execute(
+            """SELECT c.id AS conversation_id, ct.display_name AS contact_name,
+                      ch.channel_type, c.status, c.priority,
+                      m.created_at, m.sender_type, m.sender_id, m.message_type, m.content,
+                      a.username AS admin_username, a.display_name AS admin_display_name
+               FROM conversations c
+               JOIN contacts ct ON c.contact_id = ct.id
+               JOIN channels ch ON c.channel_id = ch.id
+               JOIN messages m ON m.conversation_id = c.id
+               LEFT JOIN admins a ON m.sender_admin_id = a.id
+               WHERE c.org_id = ?
+               ORDER BY c.id, m.created_at, m.id""",
+            (org_id,),
+        )
+    finally:
+        conn.close()
+
+
 def get_message_count(conversation_id):
     """Get total message count for a conversation."""
     conn = get_db()
@@ -676,6 +1206,18 @@ def get_message_count(conversation_id):
 
 def mark_messages_read(conversation_id):
     conn = get_db()
+    # unread_count is maintained by add_message, so consult it before
+    # touching the messages table at all: the common re-open of an
+    # already-read conversation becomes a single-row read. When marking,
+    # flip every is_read = 0 row — the counter only tracks contact
+    # messages, so limiting by it would skip admin/AI rows and strand
+    # them unread behind the zero-counter early return.
+    unread = conn.execute(
+        "SELECT unread_count FROM conversations WHERE id = ?", (conversation_id,)
+    ).fetchone()
+    if not unread or not unread[0]:
+        conn.close()
+        return
     conn.execute(
         "UPDATE messages SET is_read = 1 WHERE conversation_id = ? AND is_read = 0",
         (conversation_id,),
@@ -688,6 +1230,69 @@ def mark_messages_read(conversation_id):
     conn.close()
 
 
+# Read-marker writes are debounced: callers enqueue conversation ids and a
+# background thread flushes them as one multi-row UPDATE. Many open tabs
+# hammering mark-read otherwise serialize on SQLite's writer lock, one
+# journal fsync each. Markers may lag by up to the flush interval.
+_READ_FLUSH_INTERVAL = 0.5
+_READ_FLUSH_BATCH = 100
+_read_queue = queue.Queue()
+_read_flusher_lock = threading.Lock()
+_read_flusher_started = False
+
+
+def _flush_read_marks():
+    while True:
+        ids = {_read_queue.get()}
+        deadline = time.monotonic() + _READ_FLUSH_INTERVAL
+        while len(ids) < _READ_FLUSH_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                ids.add(_read_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            conn = get_db()
+            # Same counter guard as mark_messages_read: drop queued ids
+            # with nothing unread before paying for the messages UPDATE
+            placeholders = ",".join("?" * len(ids))
+            rows = conn.execute(
+                f"SELECT id FROM conversations WHERE id IN ({placeholders}) AND unread_count > 0",
+                tuple(ids),
+            ).fetchall()
+            if not rows:
+                conn.close()
+                continue
+            ids = [row[0] for row in rows]
+            placeholders = ",".join("?" * len(ids))
+            params = tuple(ids)
+            conn.execute(
+                f"UPDATE messages SET is_read = 1 WHERE conversation_id IN ({placeholders}) AND is_read = 0",
+                params,
+            )
+            conn.execute(
+                f"UPDATE conversations SET unread_count = 0 WHERE id IN ({placeholders})",
+                params,
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"[Read flush] Error: {e}")
+
+
+def mark_messages_read_async(conversation_id):
+    """Queue a conversation for batched read-marking (may lag ~500ms)."""
+    global _read_flusher_started
+    if not _read_flusher_started:
+        with _read_flusher_lock:
+            if not _read_flusher_started:
+                threading.Thread(target=_flush_read_marks, daemon=True).start()
+                _read_flusher_started = True
+    _read_queue.put(conversation_id)
+
+
 # ============================================================
 # Template Operations
 # ============================================================
@@ -726,10 +1331,9 @@ def update_template(template_id, **fields):
     updates = {k: v for k, v in fields.items() if k in allowed and v is not None}
     if not updates:
         return
-    set_clause = ", ".join(f"{k} = ?" for k in updates)
     values = list(updates.values()) + [template_id]
     conn = get_db()
-    conn.execute(f"UPDATE message_templates SET {set_clause} WHERE id = ?", values)
+    conn.execute(_update_sql("message_templates", tuple(updates)), values)
     conn.commit()
     conn.close()
 
@@ -741,11 +1345,55 @@ def delete_template(template_id):
     conn.close()
 
 
+# Usage counts are debounced the same way as read markers: each send
+# enqueues a template id and a background thread folds them into one
+# UPDATE per template per flush. The counter is advisory (it orders the
+# template picker), so lagging by the flush interval — or losing the
+# last window on a hard crash — is an acceptable trade for not paying a
+# commit fsync per templated send.
+_USAGE_FLUSH_INTERVAL = 5.0
+_USAGE_FLUSH_BATCH = 500
+_usage_queue = queue.Queue()
+_usage_flusher_lock = threading.Lock()
+_usage_flusher_started = False
+
+
+def _flush_template_usage():
+    while True:
+        ids = [_usage_queue.get()]
+        deadline = time.monotonic() + _USAGE_FLUSH_INTERVAL
+        while len(ids) < _USAGE_FLUSH_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                ids.append(_usage_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            counts = {}
+            for template_id in ids:
+                counts[template_id] = counts.get(template_id, 0) + 1
+            conn = get_db()
+            conn.executemany(
+                "UPDATE message_templates SET usage_count = usage_count + ? WHERE id = ?",
+                [(n, template_id) for template_id, n in counts.items()],
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"[Usage flush] Error: {e}")
+
+
 def increment_template_usage(template_id):
-    conn = get_db()
-    conn.execute("UPDATE message_templates SET usage_count = usage_count + 1 WHERE id = ?", (template_id,))
-    conn.commit()
-    conn.close()
+    """Queue a usage-count bump for batched flushing (may lag ~5s)."""
+    global _usage_flusher_started
+    if not _usage_flusher_started:
+        with _usage_flusher_lock:
+            if not _usage_flusher_started:
+                threading.Thread(target=_flush_template_usage, daemon=True).start()
+                _usage_flusher_started = True
+    _usage_queue.put(template_id)
 
 
 # ============================================================
@@ -755,14 +1403,11 @@ def increment_template_usage(template_id):
 
 def add_conversation_tag(conversation_id, org_id, tag):
     conn = get_db()
-    try:
-        conn.execute(
-            "INSERT INTO conversation_tags (conversation_id, org_id, tag) VALUES (?, ?, ?)",
-            (conversation_id, org_id, tag),
-        )
-        conn.commit()
-    except Exception:
-        pass  # Duplicate tag
+    conn.execute(
+        "INSERT OR IGNORE INTO conversation_tags (conversation_id, org_id, tag) VALUES (?, ?, ?)",
+        (conversation_id, org_id, tag),
+    )
+    conn.commit()
     conn.close()
 
 
@@ -786,6 +1431,28 @@ def get_conversation_tags(conversation_id):
     return [t["tag"] for t in tags]
 
 
+def get_tags_for_conversations(conversation_ids):
+    """Fetch tags for many conversations in one query.
+
+    Returns {conversation_id: [tag, ...]}; conversations without tags
+    are absent from the map.
+    """
+    if not conversation_ids:
+        return {}
+    conn = get_db()
+    placeholders = ",".join("?" * len(conversation_ids))
+    rows = conn.execute(
+        f"SELECT conversation_id, tag FROM conversation_tags "
+        f"WHERE conversation_id IN ({placeholders}) ORDER BY tag",
+        tuple(conversation_ids),
+    ).fetchall()
+    conn.close()
+    tags_map = {}
+    for row in rows:
+        tags_map.setdefault(row["conversation_id"], []).append(row["tag"])
+    return tags_map
+
+
 # ============================================================
 # Notification Operations
 # ============================================================
@@ -804,13 +1471,38 @@ def create_notification(org_id, admin_id, notification_type, title, body="",
     conn.close()
 
 
-def get_notifications(admin_id, unread_only=False, limit=20):
+def create_notifications_bulk(rows):
+    """Insert many notifications in one statement and one commit.
+
+    rows: (org_id, admin_id, notification_type, title, body,
+    reference_type, reference_id) tuples — same order as
+    create_notification's parameters.
+    """
+    if not rows:
+        return
+    conn = get_db()
+    conn.executemany(
+        """INSERT INTO admin_notifications
+           (org_id, admin_id, notification_type, title, body, reference_type, reference_id)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_notifications(admin_id, unread_only=False, limit=20, after_id=None):
     conn = get_db()
     query = "SELECT * FROM admin_notifications WHERE admin_id = ?"
     params = [admin_id]
     if unread_only:
         query += " AND is_read = 0"
-    query += " ORDER BY created_at DESC LIMIT ?"
+    if after_id is not None:
+        # Keyset cursor: resume strictly after the given notification
+        query += (" AND (created_at, id) <"
+                  " (SELECT created_at, id FROM admin_notifications WHERE id = ?)")
+        params.append(after_id)
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
     params.append(limit)
     notifications = conn.execute(query, params).fetchall()
     conn.close()
@@ -838,19 +1530,19 @@ def mark_all_notifications_read(admin_id):
 
 def get_messaging_overview(org_id, days=30):
     conn = get_db()
-    stats = {}
-    stats["total_conversations"] = conn.execute(
-        "SELECT COUNT(*) FROM conversations WHERE org_id = ?", (org_id,)
-    ).fetchone()[0]
-    stats["open_conversations"] = conn.execute(
-        "SELECT COUNT(*) FROM conversations WHERE org_id = ? AND status IN ('open', 'assigned')", (org_id,)
-    ).fetchone()[0]
-    stats["total_messages"] = conn.execute(
-        "SELECT COUNT(*) FROM messages WHERE org_id = ?", (org_id,)
-    ).fetchone()[0]
-    stats["total_contacts"] = conn.execute(
-        "SELECT COUNT(*) FROM contacts WHERE org_id = ?", (org_id,)
-    ).fetchone()[0]
+    # The heavy totals come from trigger-maintained counters on the org
+    # row — O(1) instead of COUNT scans over three tables per page load
+    counters = conn.execute(
+        "SELECT conversations_count, conversations_open_count, messages_count, contacts_count "
+        "FROM organizations WHERE id = ?",
+        (org_id,),
+    ).fetchone()
+    stats = {
+        "total_conversations": counters["conversations_count"] if counters else 0,
+        "open_conversations": counters["conversations_open_count"] if counters else 0,
+        "total_messages": counters["messages_count"] if counters else 0,
+        "total_contacts": counters["contacts_count"] if counters else 0,
+    }
     stats["channels"] = conn.execute(
         "SELECT COUNT(*) FROM channels WHERE org_id = ? AND is_active = 1", (org_id,)
     ).fetchone()[0]